@@ -0,0 +1,152 @@
+# analytics.py
+# Long-range calorie analytics: weekly and monthly buckets, a trailing moving
+# average and the gap to the user's calorie target. The daily rollups are laid
+# out as one dense numpy array per range and every statistic is array math over
+# it. Results are cached per worker, keyed by the user's calories and
+# preferences versions, so a new log or goal change is picked up immediately.
+
+import os
+import re
+import datetime
+
+import numpy as np
+
+from models import UserPreference
+from calorie_rollups import daily_totals
+from versions import get_versions, CALORIES, PREFERENCES
+from cache import LRUCache
+
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", 1024))
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", 3600))  # seconds
+MAX_ANALYTICS_DAYS = 731
+DEFAULT_MOVING_AVERAGE_DAYS = 7
+
+# Daily target used when the goals do not state one, and how named goals shift it
+DEFAULT_CALORIE_TARGET = float(os.getenv("DEFAULT_CALORIE_TARGET", 2000))
+GOAL_ADJUSTMENTS = {
+    "weight loss": -500,
+    "lose weight": -500,
+    "fat loss": -500,
+    "weight gain": 500,
+    "gain weight": 500,
+    "muscle gain": 300,
+    "build muscle": 300
+}
+_EXPLICIT_TARGET = re.compile(r"(\d{3,5}(?:\.\d+)?)\s*(?:k?cal|calories)", re.IGNORECASE)
+
+_cache = LRUCache(ANALYTICS_CACHE_SIZE, ttl=ANALYTICS_CACHE_TTL)
+
+
+def calorie_target(goals):
+    """
+    (daily calorie target, source) from the user's health goals.
+    A goal like "1800 kcal" is taken as stated; otherwise named goals such as
+    "Weight Loss" adjust DEFAULT_CALORIE_TARGET.
+    """
+    for goal in goals or []:
+        match = _EXPLICIT_TARGET.search(goal)
+        if match:
+            return float(match.group(1)), "goals"
+    adjustment = sum(GOAL_ADJUSTMENTS.get((goal or "").strip().lower(), 0) for goal in goals or [])
+    return DEFAULT_CALORIE_TARGET + adjustment, "goals" if adjustment else "default"
+
+
+def _daily_series(user, start_date, end_date):
+    """(dates, calories, logged) arrays with one slot per day from start_date to end_date"""
+    dates = np.arange(
+        np.datetime64(start_date, 'D'),
+        np.datetime64(end_date + datetime.timedelta(days=1), 'D')
+    )
+    calories = np.zeros(len(dates))
+    logged = np.zeros(len(dates), dtype=bool)
+    totals = daily_totals(user, start_date, end_date)
+    if totals:
+        offsets = np.array([(day - start_date).days for day, _, _ in totals])
+        calories[offsets] = [total for _, total, _ in totals]
+        logged[offsets] = True
+    return dates, calories, logged
+
+def _moving_average(calories, logged, window):
+    """Trailing mean over the logged days in each window (NaN where none were logged)"""
+    sums = np.concatenate(([0.0], np.cumsum(calories)))
+    counts = np.concatenate(([0], np.cumsum(logged)))
+    window_sums = sums[window:] - sums[:-window]
+    window_counts = counts[window:] - counts[:-window]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(window_counts > 0, window_sums / window_counts, np.nan)
+
+def _buckets(keys, calories, logged, target):
+    """Per-bucket totals, logged days, average per logged day and delta to target"""
+    starts, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse, weights=calories)
+    logged_days = np.bincount(inverse, weights=logged)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        averages = np.where(logged_days > 0, totals / logged_days, np.nan)
+    return [
+        {
+            "start": str(start),
+            "calories": _round(total),
+            "loggedDays": int(days),
+            "average": _round(average),
+            "delta": _round(average - target)
+        }
+        for start, total, days, average in zip(starts, totals, logged_days, averages)
+    ]
+
+def _round(value):
+    return None if np.isnan(value) else round(float(value), 1)
+
+
+def compute_analytics(user, start_date, end_date, window, target):
+    """Analytics for [start_date, end_date]; see calorie_analytics()"""
+    # Load window - 1 extra days so the first moving averages cover a full window
+    lead = window - 1
+    dates, calories, logged = _daily_series(user, start_date - datetime.timedelta(days=lead), end_date)
+    moving = _moving_average(calories, logged, window)
+    dates, calories, logged = dates[lead:], calories[lead:], logged[lead:]
+
+    day_numbers = dates.astype(np.int64)
+    # 1970-01-01 was a Thursday; shift so weeks start on Monday
+    weeks = (dates - ((day_numbers + 3) % 7).astype('timedelta64[D]')).astype('datetime64[D]')
+    months = dates.astype('datetime64[M]')
+
+    logged_days = int(logged.sum())
+    total = float(calories.sum())
+    average = total / logged_days if logged_days else np.nan
+    return {
+        "totalCalories": _round(total),
+        "loggedDays": logged_days,
+        "averagePerLoggedDay": _round(average),
+        "averageDelta": _round(average - target),
+        "daily": [
+            {"date": str(day), "calories": _round(value) if is_logged else None, "movingAverage": _round(mean)}
+            for day, value, is_logged, mean in zip(dates, calories, logged, moving)
+        ],
+        "weekly": _buckets(weeks, calories, logged, target),
+        "monthly": _buckets(months, calories, logged, target)
+    }
+
+def calorie_analytics(user, start_date, end_date, window=DEFAULT_MOVING_AVERAGE_DAYS):
+    """
+    Calorie trends for user between start_date and end_date (inclusive): daily
+    totals with a trailing moving average, weekly (Monday-start) and monthly
+    buckets, and the delta of each to the user's daily calorie target.
+    """
+    versions = get_versions(user)
+    key = (
+        str(user.pk), start_date.isoformat(), end_date.isoformat(), window,
+        versions.get(CALORIES, 0), versions.get(PREFERENCES, 0)
+    )
+    result = _cache.get(key)
+    if result is None:
+        pref = UserPreference.objects(user=user).only('health_goals').first()
+        target, source = calorie_target(pref.health_goals if pref else [])
+        result = {
+            "startDate": start_date.isoformat(),
+            "endDate": end_date.isoformat(),
+            "movingAverageDays": window,
+            "target": {"calories": target, "source": source},
+            **compute_analytics(user, start_date, end_date, window, target)
+        }
+        _cache.set(key, result)
+    return result
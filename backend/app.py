@@ -1,10 +1,17 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
+import sys
+import json
+import logging
+import click
+from collections import Counter
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from mongoengine.errors import ValidationError
+from pymongo import UpdateOne
 from models import (
     db,
     User,
@@ -15,13 +22,54 @@ from models import (
     SavedRecipe,
     DailyCalorieLog
 )
-from llm_service import generate_recipes, get_nutrition_info
+from llm_service import stream_recipes, DEFAULT_RECIPE_COUNT, MAX_RECIPE_COUNT
+from llm_client import LLMError
+from jobs import submit_recipe_job, get_recipe_job, JobQueueFull
+from serializers import (
+    rows,
+    projection,
+    select,
+    json_response,
+    ingredient_row,
+    saved_recipe_row,
+    calorie_log_row,
+    INGREDIENT_FIELDS,
+    SAVED_RECIPE_API_FIELDS,
+    CALORIE_LOG_API_FIELDS
+)
+from pagination import paginate, page_size as parse_page_size, parse_fields
+from identity import current_user_ref, current_user
+from versions import bump_version, FRIDGE, PREFERENCES, CALORIES, SAVED_RECIPES
+from etags import conditional
+from precompute import load_recipe_context, find_precomputed, schedule_prefetch
+from ingredient_parser import parse_ingredients, lookup_catalog
+import metrics
+from indexes import ensure_indexes, check_query_plans, MONGO_INDEX_MODE
+from calorie_rollups import record_calories, daily_totals, backfill_rollups, ensure_rollups
+from analytics import calorie_analytics, MAX_ANALYTICS_DAYS, DEFAULT_MOVING_AVERAGE_DAYS
+from catalog_import import import_catalog, IMPORT_BATCH_SIZE, upsert_operation as upsert_catalog_row, write_batch as write_catalog_batch
+from catalog import CatalogItem, get_catalog, bump_catalog_version, search_ingredients as search_catalog, invalidate_user_search
+from cache import (
+    cached_generate_recipes,
+    cached_nutrition_info,
+    cached_nutrition_info_batch,
+    normalize_ingredient_name,
+    recipe_cache_key,
+    get_cached_recipes,
+    store_cached_recipes
+)
 from typing import Optional
 
 # Load environment variables
 env_path = os.path.join(os.path.dirname(__file__), '.env')
 load_dotenv(env_path)
 
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 # Enable CORS explicitly for API routes (and root) so preflight requests succeed
 CORS(
@@ -34,8 +82,9 @@ CORS(
 def add_cors_headers(response):
     # Ensure preflight responses are not blocked
     response.headers["Access-Control-Allow-Origin"] = "*"
-    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, If-None-Match"
     response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+    response.headers["Access-Control-Expose-Headers"] = "X-Next-Cursor, ETag"
     return response
 
 # MongoDB Configuration
@@ -50,10 +99,79 @@ jwt = JWTManager(app)
 # Initialize DB with app
 db.init_app(app)
 
+# Build (or verify) the declared indexes once at startup; see indexes.py
+startup_missing_indexes = None
+try:
+    startup_missing_indexes = ensure_indexes()
+except Exception as e:
+    logger.warning(f"Index check failed: {e}")
+
+# Entries logged before the daily rollups existed are folded in once, in the background
+try:
+    ensure_rollups()
+except Exception as e:
+    logger.warning(f"Calorie rollup check failed: {e}")
+
+@app.cli.command("check-indexes")
+def check_indexes_command():
+    """Verify declared indexes exist and no hot route query does a COLLSCAN"""
+    # Startup already built or checked them, unless that was skipped or failed
+    missing = startup_missing_indexes
+    if missing is None or MONGO_INDEX_MODE == "off":
+        missing = ensure_indexes("verify")
+    failures = check_query_plans()
+    for name, stages in failures.items():
+        print(f"COLLSCAN: {name} ({' -> '.join(stages)})")
+    if missing or failures:
+        sys.exit(1)
+    print("All indexes present; no route query scans a whole collection.")
+
+@app.cli.command("backfill-calorie-rollups")
+def backfill_calorie_rollups_command():
+    """Rebuild the daily calorie rollups from the logged entries"""
+    written = backfill_rollups()
+    print(f"Wrote {written} daily calorie rollups.")
+
+@app.cli.command("import-catalog")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="default: from the file extension")
+@click.option("--batch-size", default=IMPORT_BATCH_SIZE, show_default=True)
+@click.option("--resume", is_flag=True, help="skip rows loaded by an earlier, interrupted run")
+@click.option("--map", "mappings", multiple=True, help="catalog_field=source_column, e.g. name=Description")
+def import_catalog_command(path, fmt, batch_size, resume, mappings):
+    """Stream a CSV or JSON Lines food dataset into the common ingredient catalog"""
+    overrides = {}
+    for mapping in mappings:
+        field, _, column = mapping.partition("=")
+        if not column:
+            raise click.BadParameter(f"expected field=column, got '{mapping}'", param_hint="--map")
+        overrides[field.strip()] = column
+    try:
+        stats = import_catalog(path, fmt, batch_size, resume, overrides)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    print(
+        f"Imported {stats['rows']} rows: {stats['inserted']} new, {stats['updated']} updated, "
+        f"{stats['skipped']} skipped."
+    )
+
+@app.before_request
+def tag_llm_endpoint():
+    # LLM metrics are labelled with the route that triggered the call
+    metrics.set_endpoint(request.endpoint)
+
 @app.route('/')
 def home():
     return jsonify({"message": "HealthyDay Backend is running!"})
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint; protected by METRICS_TOKEN when it is set"""
+    token = os.getenv("METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 # -------------------------
 # Auth Routes
 # -------------------------
@@ -110,8 +228,7 @@ def change_password():
     Change password for the authenticated user.
     Requires current password and a new password.
     """
-    current_user_id = get_jwt_identity()
-    user = User.objects(id=current_user_id).first()
+    user = current_user()
     if not user:
         return jsonify({"error": "User not found"}), 404
 
@@ -167,61 +284,151 @@ def change_password_by_username():
 
 @app.route('/api/ingredients', methods=['GET'])
 @jwt_required()
+@conditional(FRIDGE)
 def get_ingredients():
-    current_user_id = get_jwt_identity()
-    user = User.objects(id=current_user_id).first()
-    ingredients = Ingredient.objects(user=user)
-    return jsonify([ing.to_json() for ing in ingredients]), 200
+    user = current_user_ref()
+    return json_response(rows(Ingredient.objects(user=user), INGREDIENT_FIELDS, ingredient_row))
+
+def _fridge_ingredient(user, data):
+    """Unsaved fridge Ingredient from a request payload (ValueError on bad numbers)"""
+    return Ingredient(
+        user=user,
+        name=data.get('name'),
+        quantity=str(data.get('quantity', '')),
+        unit=data.get('unit', ''),
+        expiry_date=data.get('expiryDate', ''),
+        calories=float(data.get('calories', 0) or 0),
+        protein=float(data.get('protein', 0) or 0),
+        carbs=float(data.get('carbs', 0) or 0),
+        fat=float(data.get('fat', 0) or 0)
+    )
+
+def _custom_ingredient_fields(ingredient):
+    """UserDefinedIngredient fields remembered from a fridge ingredient"""
+    return {
+        "name": ingredient.name,
+        "default_unit": ingredient.unit,
+        "calories": ingredient.calories,
+        "protein": ingredient.protein,
+        "carbs": ingredient.carbs,
+        "fat": ingredient.fat
+    }
 
 @app.route('/api/ingredients', methods=['POST'])
 @jwt_required()
 def add_ingredient():
-    current_user_id = get_jwt_identity()
-    user = User.objects(id=current_user_id).first()
+    user = current_user_ref()
     data = request.json
     
     ing_name = data.get('name')
     
     try:
         # 1. Save as Fridge Ingredient (Instance)
-        new_ingredient = Ingredient(
-            user=user,
-            name=ing_name,
-            quantity=str(data.get('quantity', '')),
-            unit=data.get('unit', ''),
-            expiry_date=data.get('expiryDate', ''),
-            calories=float(data.get('calories', 0) or 0),
-            protein=float(data.get('protein', 0) or 0),
-            carbs=float(data.get('carbs', 0) or 0),
-            fat=float(data.get('fat', 0) or 0)
-        )
+        new_ingredient = _fridge_ingredient(user, data)
         new_ingredient.save()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
+    # The fridge changed whatever happens below: clients must not get a 304 for it
+    bump_version(user, FRIDGE)
+    schedule_prefetch(user)
+    try:
         # 2. Check if we should save as Custom Ingredient for future use
         # Only if it doesn't exist in Common DB and User Defined DB
-        common_exists = CommonIngredient.objects(name__iexact=ing_name).first()
-        user_defined_exists = UserDefinedIngredient.objects(user=user, name__iexact=ing_name).first()
-        
-        if not common_exists and not user_defined_exists:
-            UserDefinedIngredient(
-                user=user,
-                name=ing_name,
-                default_unit=data.get('unit', ''),
-                calories=float(data.get('calories', 0) or 0),
-                protein=float(data.get('protein', 0) or 0),
-                carbs=float(data.get('carbs', 0) or 0),
-                fat=float(data.get('fat', 0) or 0)
-            ).save()
-
-        return jsonify(new_ingredient.to_json()), 201
+        common_exists = get_catalog().get(ing_name)
+        user_defined_exists = (
+            not common_exists
+            and UserDefinedIngredient.objects(user=user, name__iexact=ing_name).first()
+        )
+
+        if common_exists:
+            # Popular ingredients rank higher in search once the catalog reloads
+            CommonIngredient.objects(id=common_exists.id).update_one(inc__popularity=1)
+        elif not user_defined_exists:
+            UserDefinedIngredient(user=user, **_custom_ingredient_fields(new_ingredient)).save()
     except Exception as e:
-        return jsonify({"error": str(e)}), 400
+        # Bookkeeping only; the ingredient itself was added
+        logger.warning(f"Catalog bookkeeping for {ing_name!r} failed: {e}")
+    finally:
+        invalidate_user_search(user)
+    return jsonify(new_ingredient.to_json()), 201
+
+MAX_BULK_INGREDIENTS = 100
+
+@app.route('/api/ingredients/bulk', methods=['POST'])
+@jwt_required()
+def add_ingredients_bulk():
+    """
+    Add many fridge ingredients at once (e.g. after a voice parse).
+    Body: {"ingredients": [...]} with the same item shape as POST /api/ingredients.
+    Valid items are inserted with one insert_many and new custom ingredients are
+    registered with one bulk upsert. Returns a result per item, in order:
+    {"status": "created", "ingredient": {...}} or {"status": "error", "error": "..."}.
+    """
+    user = current_user_ref()
+    items = (request.json or {}).get('ingredients')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "ingredients must be a non-empty list"}), 400
+    if len(items) > MAX_BULK_INGREDIENTS:
+        return jsonify({"error": f"At most {MAX_BULK_INGREDIENTS} ingredients per request"}), 400
+
+    results = [None] * len(items)
+    valid = []
+    for index, data in enumerate(items):
+        try:
+            if not isinstance(data, dict) or not str(data.get('name') or '').strip():
+                raise ValueError("name is required")
+            ingredient = _fridge_ingredient(user, data)
+            ingredient.validate()
+        except (ValueError, TypeError, ValidationError) as e:
+            results[index] = {"status": "error", "error": str(e)}
+            continue
+        valid.append((index, ingredient))
+
+    if valid:
+        ids = Ingredient.objects.insert([ingredient for _, ingredient in valid], load_bulk=False)
+        for (index, ingredient), ingredient_id in zip(valid, ids):
+            ingredient.id = ingredient_id
+            results[index] = {"status": "created", "ingredient": ingredient.to_json()}
+
+        # Remember names that are neither common nor custom yet; count common ones
+        known = _lookup_known_ingredients(user, list({ingredient.name for _, ingredient in valid}))
+        popularity = Counter()
+        new_custom = {}
+        for _, ingredient in valid:
+            key = normalize_ingredient_name(ingredient.name)
+            source = known.get(key)
+            if isinstance(source, CatalogItem):
+                popularity[source.id] += 1
+            elif source is None:
+                new_custom.setdefault(key, ingredient)
+        if new_custom:
+            UserDefinedIngredient._get_collection().bulk_write([
+                UpdateOne(
+                    {"user": user.pk, "name": ingredient.name},
+                    {"$setOnInsert": {**_custom_ingredient_fields(ingredient), "created_at": datetime.utcnow()}},
+                    upsert=True
+                )
+                for ingredient in new_custom.values()
+            ], ordered=False)
+        if popularity:
+            CommonIngredient._get_collection().bulk_write([
+                UpdateOne({"_id": common_id}, {"$inc": {"popularity": count}})
+                for common_id, count in popularity.items()
+            ], ordered=False)
+
+        bump_version(user, FRIDGE)
+        schedule_prefetch(user)
+        invalidate_user_search(user)
+
+    created = sum(1 for result in results if result["status"] == "created")
+    status = 201 if created else 400
+    return jsonify({"created": created, "failed": len(results) - created, "results": results}), status
 
 @app.route('/api/ingredients/<id>', methods=['PUT'])
 @jwt_required()
 def update_ingredient(id):
-    current_user_id = get_jwt_identity()
-    user = User.objects(id=current_user_id).first()
+    user = current_user_ref()
     data = request.json
     
     ingredient = Ingredient.objects(id=id, user=user).first()
@@ -239,6 +446,9 @@ def update_ingredient(id):
         ingredient.fat = float(data.get('fat', ingredient.fat) or 0)
         
         ingredient.save()
+        bump_version(user, FRIDGE)
+        schedule_prefetch(user)
+        invalidate_user_search(user)
         return jsonify(ingredient.to_json()), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -246,40 +456,42 @@ def update_ingredient(id):
 @app.route('/api/ingredients/<id>', methods=['DELETE'])
 @jwt_required()
 def delete_ingredient(id):
-    current_user_id = get_jwt_identity()
-    user = User.objects(id=current_user_id).first()
+    user = current_user_ref()
     
     ingredient = Ingredient.objects(id=id, user=user).first()
     if not ingredient:
         return jsonify({"error": "Ingredient not found"}), 404
     
     ingredient.delete()
+    bump_version(user, FRIDGE)
+    schedule_prefetch(user)
+    invalidate_user_search(user)
     return jsonify({"message": "Deleted successfully"}), 200
 
 # -------------------------
 # Search Routes (Common + UserDefined)
 # -------------------------
 
+MAX_SEARCH_RESULTS = 25
+
 @app.route('/api/common-ingredients/search', methods=['GET'])
 @jwt_required()
 def search_ingredients():
-    current_user_id = get_jwt_identity()
-    user = User.objects(id=current_user_id).first()
+    user = current_user_ref()
     query = request.args.get('q', '')
     
     if not query:
         return jsonify([])
     
-    # 1. Search Common Ingredients
-    common_results = CommonIngredient.objects(name__icontains=query).limit(5)
-    common_list = [item.to_json() for item in common_results]
-    
-    # 2. Search User Defined Ingredients
-    user_results = UserDefinedIngredient.objects(user=user, name__icontains=query).limit(5)
-    user_list = [item.to_json() for item in user_results]
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), MAX_SEARCH_RESULTS)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
     
-    # Merge results (User defined first, then common)
-    return jsonify(user_list + common_list)
+    # Ranked, typo-tolerant matches from in-memory indexes of the common
+    # catalog and the user's own ingredients
+    results = search_catalog(user, query, limit)
+    return jsonify([item.to_json() for item in results])
 
 @app.route('/api/admin/seed-common', methods=['POST'])
 def seed_common_ingredients():
@@ -307,12 +519,11 @@ def seed_common_ingredients():
         {"name": "Tuna (Canned)", "calories": 132, "protein": 28, "carbs": 0, "fat": 1, "category": "Seafood"},
     ]
     
-    count = 0
-    for item in seed_data:
-        if not CommonIngredient.objects(name=item["name"]).first():
-            CommonIngredient(**item).save()
-            count += 1
-            
+    # One bulk upsert; existing entries are left untouched
+    count, _ = write_catalog_batch([upsert_catalog_row(item, overwrite=False) for item in seed_data])
+    if count:
+        bump_catalog_version()
+
     return jsonify({"message": f"Seeded {count} new ingredients"}), 201
 
 # -------------------------
@@ -321,9 +532,9 @@ def seed_common_ingredients():
 
 @app.route('/api/preferences', methods=['GET'])
 @jwt_required()
+@conditional(PREFERENCES)
 def get_preferences():
-    current_user_id = get_jwt_identity()
-    user = User.objects(id=current_user_id).first()
+    user = current_user_ref()
     
     pref = UserPreference.objects(user=user).first()
     if not pref:
@@ -336,8 +547,7 @@ def get_preferences():
 @app.route('/api/preferences', methods=['PUT'])
 @jwt_required()
 def update_preferences():
-    current_user_id = get_jwt_identity()
-    user = User.objects(id=current_user_id).first()
+    user = current_user_ref()
     data = request.json
     
     pref = UserPreference.objects(user=user).first()
@@ -352,6 +562,7 @@ def update_preferences():
     pref.notes = data.get('notes', pref.notes)
     
     pref.save()
+    bump_version(user, PREFERENCES)
     return jsonify(pref.to_json()), 200
 
 # -------------------------
@@ -362,8 +573,7 @@ def update_preferences():
 @jwt_required()
 def add_calorie_log():
     """Add a calorie intake entry for the current user"""
-    current_user_id = get_jwt_identity()
-    user = User.objects(id=current_user_id).first()
+    user = current_user_ref()
     data = request.json or {}
 
     # Parse calories
@@ -394,6 +604,8 @@ def add_calorie_log():
             note=data.get('note', '')
         )
         log.save()
+        record_calories(user, log_date, calories)
+        bump_version(user, CALORIES)
         return jsonify(log.to_json()), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -401,9 +613,13 @@ def add_calorie_log():
 @app.route('/api/calories/summary', methods=['GET'])
 @jwt_required()
 def get_calorie_summary():
-    """Get calorie totals by day within a date range (defaults to last 7 days)"""
-    current_user_id = get_jwt_identity()
-    user = User.objects(id=current_user_id).first()
+    """
+    Get calorie totals by day within a date range (defaults to last 7 days).
+    Totals come from the daily rollups; pass includeEntries=true for the logged
+    entries themselves, a page at a time: limit, cursor (nextCursor from the
+    previous page) and fields (e.g. fields=date,calories).
+    """
+    user = current_user_ref()
 
     today = datetime.utcnow().date()
     end_str = request.args.get('end')
@@ -429,42 +645,91 @@ def get_calorie_summary():
     if start_date > end_date:
         return jsonify({"error": "Start date cannot be after end date"}), 400
 
-    logs = DailyCalorieLog.objects(
-        user=user,
-        date__gte=start_date,
-        date__lte=end_date
-    ).order_by('date')
-
-    # Aggregate totals per day
-    daily_totals = {}
-    for log in logs:
-        key = log.date.isoformat()
-        daily_totals[key] = daily_totals.get(key, 0) + log.calories
-
-    daily_totals_list = [{"date": d, "calories": c} for d, c in sorted(daily_totals.items())]
-    total_calories = sum(daily_totals.values())
+    include_entries = request.args.get('includeEntries', '').lower() in ('1', 'true', 'yes')
+    try:
+        limit = parse_page_size(request.args.get('limit'))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    try:
+        fields = parse_fields(request.args.get('fields'), CALORIE_LOG_API_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    return jsonify({
+    totals = daily_totals(user, start_date, end_date)
+    summary = {
         "startDate": start_date.isoformat(),
         "endDate": end_date.isoformat(),
-        "totalCalories": total_calories,
-        "dailyTotals": daily_totals_list,
-        "entries": [log.to_json() for log in logs]
-    }), 200
+        "totalCalories": sum(calories for _, calories, _ in totals),
+        "dailyTotals": [{"date": day.isoformat(), "calories": calories} for day, calories, _ in totals]
+    }
+
+    if include_entries:
+        logs = DailyCalorieLog.objects(
+            user=user,
+            date__gte=start_date,
+            date__lte=end_date
+        ).order_by('date', 'id').only(*projection(fields, CALORIE_LOG_API_FIELDS, 'date')).as_pymongo()
+        try:
+            docs, next_cursor = paginate(logs, 'date', request.args.get('cursor'), limit)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        summary["entries"] = [select(calorie_log_row(doc), fields) for doc in docs]
+        summary["nextCursor"] = next_cursor
+
+    return json_response(summary)
+
+@app.route('/api/calories/analytics', methods=['GET'])
+@jwt_required()
+def get_calorie_analytics():
+    """
+    Calorie trends over a long range (defaults to the last 180 days): daily totals
+    with a moving average (window days), weekly and monthly buckets, and the
+    delta to the calorie target derived from the user's health goals.
+    """
+    user = current_user_ref()
+
+    try:
+        end_date = datetime.strptime(request.args['end'], "%Y-%m-%d").date() if request.args.get('end') else datetime.utcnow().date()
+        start_date = datetime.strptime(request.args['start'], "%Y-%m-%d").date() if request.args.get('start') else end_date - timedelta(days=179)
+    except ValueError:
+        return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+
+    if start_date > end_date:
+        return jsonify({"error": "Start date cannot be after end date"}), 400
+    if (end_date - start_date).days >= MAX_ANALYTICS_DAYS:
+        return jsonify({"error": f"Date range cannot exceed {MAX_ANALYTICS_DAYS} days"}), 400
+
+    try:
+        window = int(request.args.get('window', DEFAULT_MOVING_AVERAGE_DAYS))
+    except ValueError:
+        return jsonify({"error": "window must be an integer"}), 400
+    if not 1 <= window <= 90:
+        return jsonify({"error": "window must be between 1 and 90"}), 400
+
+    return jsonify(calorie_analytics(user, start_date, end_date, window)), 200
 
 # -------------------------
 # Voice Input / LLM Parsing Route
 # -------------------------
 
+def _llm_error_response(e):
+    """Map a structured LLM failure onto an HTTP error response"""
+    response = jsonify({"error": e.error_code, "message": str(e)})
+    response.status_code = e.status_code
+    retry_after = getattr(e, "retry_after", None)
+    if retry_after is not None:
+        response.headers["Retry-After"] = str(int(retry_after + 0.999))
+    return response
+
 @app.route('/api/ingredients/parse', methods=['POST'])
 @jwt_required()
 def parse_ingredient_list():
     """
     Parse natural language text (e.g., "I bought eggs, milk, and apples")
-    into structured ingredient list using LLM.
+    into structured ingredient list. Items found in the ingredient catalog are
+    parsed locally; only the rest are sent to the LLM.
     """
-    current_user_id = get_jwt_identity()
-    user = User.objects(id=current_user_id).first()
+    user = current_user_ref()
     data = request.json
     text = data.get('text', '')
     
@@ -472,9 +737,10 @@ def parse_ingredient_list():
         return jsonify({"error": "Text is required"}), 400
     
     try:
-        from llm_service import parse_ingredients_from_text
-        ingredients = parse_ingredients_from_text(text)
+        ingredients = parse_ingredients(user, text)
         return jsonify({"ingredients": ingredients}), 200
+    except LLMError as e:
+        return _llm_error_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -492,47 +758,103 @@ def get_ingredient_nutrition():
     
     try:
         # First, try to use existing ingredient data (common or user-defined) to avoid LLM call
-        current_user_id = get_jwt_identity()
-        user = User.objects(id=current_user_id).first()
+        user = current_user_ref()
 
-        common = CommonIngredient.objects(name__iexact=ingredient_name).first()
-        user_defined = UserDefinedIngredient.objects(user=user, name__iexact=ingredient_name).first()
-        source = common or user_defined
+        source = (
+            get_catalog().get(ingredient_name)
+            or UserDefinedIngredient.objects(user=user, name__iexact=ingredient_name).first()
+        )
         if source:
-            base = {
-                "calories": float(source.calories or 0),
-                "protein": float(source.protein or 0),
-                "carbs": float(source.carbs or 0),
-                "fat": float(source.fat or 0)
-            }
+            base = _source_nutrition(source)
             # If quantity provided, scale totals
             total = _compute_totals(base, quantity, unit)
             return jsonify({**base, **({"total": total} if total else {})}), 200
 
-        nutrition = get_nutrition_info(ingredient_name)
+        nutrition = cached_nutrition_info(ingredient_name)
         if nutrition:
-            # Check if it's a rate limit error
-            if isinstance(nutrition, dict) and nutrition.get("error") == "rate_limit":
-                return jsonify({
-                    "error": "rate_limit",
-                    "message": nutrition.get("message", "API rate limit reached. Please try again later.")
-                }), 429
-            if isinstance(nutrition, dict) and nutrition.get("error") == "missing_api_key":
-                return jsonify({
-                    "error": "missing_api_key",
-                    "message": "GROQ_API_KEY is not set on the backend."
-                }), 503
             total = _compute_totals(nutrition, quantity, unit)
             return jsonify({**nutrition, **({"total": total} if total else {})}), 200
         else:
             return jsonify({"error": "Failed to get nutrition information"}), 500
+    except LLMError as e:
+        return _llm_error_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+MAX_BATCH_ITEMS = 50
+
+def _lookup_known_ingredients(user, names):
+    """
+    {normalized name: source} for the names that resolve against the catalog or
+    the user's custom ingredients, by the same rules as the ingredient parser
+    (see ingredient_parser.lookup_catalog).
+    """
+    return lookup_catalog(user, list({normalize_ingredient_name(name) for name in names}))
+
+def _source_nutrition(source):
+    return {
+        "calories": float(source.calories or 0),
+        "protein": float(source.protein or 0),
+        "carbs": float(source.carbs or 0),
+        "fat": float(source.fat or 0)
+    }
+
+@app.route('/api/ingredients/nutrition/batch', methods=['POST'])
+@jwt_required()
+def get_ingredient_nutrition_batch():
+    """
+    Resolve nutrition for a list of ingredients in one round trip.
+    Body: {"items": [{"name", "quantity", "unit"}, ...]}
+    Known names come from the catalog/custom ingredients; the rest share one LLM call.
+    """
+    data = request.json or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list"}), 400
+    if len(items) > MAX_BATCH_ITEMS:
+        return jsonify({"error": f"At most {MAX_BATCH_ITEMS} items per request"}), 400
+
+    bad = [index for index, item in enumerate(items) if not isinstance(item, dict)]
+    if bad:
+        return jsonify({"error": f"Each item must be an object with a name (bad items at {bad})"}), 400
+
+    names = [str(item.get('name') or '').strip() for item in items]
+    if not all(names):
+        return jsonify({"error": "Ingredient name is required for every item"}), 400
+
+    user = current_user_ref()
+
+    try:
+        known = _lookup_known_ingredients(user, names)
+        unknown = [name for name in names if normalize_ingredient_name(name) not in known]
+
+        llm_error = None
+        llm_results = {}
+        if unknown:
+            try:
+                llm_results = cached_nutrition_info_batch(unknown)
+            except LLMError as e:
+                llm_error = e
+
+        results = []
+        for item, name in zip(items, names):
+            source = known.get(normalize_ingredient_name(name))
+            if source:
+                nutrition = _source_nutrition(source)
+            elif llm_error:
+                results.append({"name": name, "error": llm_error.error_code, "message": str(llm_error)})
+                continue
+            else:
+                nutrition = llm_results.get(name)
+                if not nutrition:
+                    results.append({"name": name, "error": "Failed to get nutrition information"})
+                    continue
+
+            total = _compute_totals(nutrition, item.get('quantity'), (item.get('unit') or '').strip())
+            results.append({"name": name, **nutrition, **({"total": total} if total else {})})
+
+        return jsonify({"results": results}), 200
     except Exception as e:
-        error_str = str(e)
-        if "rate_limit" in error_str.lower() or "429" in error_str:
-            return jsonify({
-                "error": "rate_limit",
-                "message": "API rate limit reached. Please try again later."
-            }), 429
         return jsonify({"error": str(e)}), 500
 
 def _compute_totals(base: dict, quantity, unit: Optional[str]):
@@ -573,6 +895,14 @@ def _compute_totals(base: dict, quantity, unit: Optional[str]):
 # Recipe Generation Routes (LLM)
 # -------------------------
 
+def _parse_recipe_count(data):
+    """Requested number of recipes, or None if invalid"""
+    try:
+        count = int(data.get('count', DEFAULT_RECIPE_COUNT))
+    except (TypeError, ValueError):
+        return None
+    return count if 1 <= count <= MAX_RECIPE_COUNT else None
+
 @app.route('/api/recipes/generate', methods=['POST'])
 @jwt_required()
 def generate_recipe():
@@ -580,61 +910,211 @@ def generate_recipe():
     Generate recipes based on user's fridge ingredients and preferences.
     Uses Groq LLM API for intelligent recipe generation.
     """
-    current_user_id = get_jwt_identity()
-    user = User.objects(id=current_user_id).first()
-    
-    # Get user's fridge ingredients
-    ingredients = Ingredient.objects(user=user)
-    ingredients_list = [ing.to_json() for ing in ingredients]
+    user = current_user_ref()
     
+    ingredients_list, preferences = load_recipe_context(user)
     if not ingredients_list:
         return jsonify({"error": "No ingredients in your fridge. Please add some ingredients first."}), 400
     
-    # Get user preferences
-    pref = UserPreference.objects(user=user).first()
-    if not pref:
-        pref = UserPreference(user=user)
-        pref.save()
-    
-    preferences = pref.to_json()
-    
     # Get meal type from request
     data = request.json or {}
     meal_type = data.get('mealType', 'Dinner')
+    count = _parse_recipe_count(data)
+    if count is None:
+        return jsonify({"error": f"count must be an integer between 1 and {MAX_RECIPE_COUNT}"}), 400
+    
+    # Served straight from the prefetcher when it already ran for this fridge
+    recipes = find_precomputed(user, meal_type, count)
+    if recipes:
+        return jsonify({
+            "recipes": recipes,
+            "count": len(recipes),
+            "cached": True,
+            "message": "Recipes generated successfully!"
+        }), 200
     
     try:
-        # Call LLM service to generate recipes
-        recipes = generate_recipes(ingredients_list, preferences, meal_type)
+        # Call LLM service to generate recipes (served from cache when the
+        # fridge, preferences and meal type match an earlier generation)
+        recipes, cached = cached_generate_recipes(ingredients_list, preferences, meal_type, count)
         
         return jsonify({
             "recipes": recipes,
             "count": len(recipes),
+            "cached": cached,
             "message": "Recipes generated successfully!"
         }), 200
         
+    except LLMError as e:
+        return _llm_error_response(e)
     except Exception as e:
         return jsonify({"error": f"Failed to generate recipes: {str(e)}"}), 500
 
+def _sse(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/recipes/generate/stream', methods=['POST'])
+@jwt_required()
+def generate_recipe_stream():
+    """
+    Streaming variant of /api/recipes/generate.
+    Sends each recipe as an SSE "recipe" event as soon as the model finishes it,
+    then a final "done" event (or "error" if generation failed midway).
+    """
+    user = current_user_ref()
+    
+    ingredients_list, preferences = load_recipe_context(user)
+    if not ingredients_list:
+        return jsonify({"error": "No ingredients in your fridge. Please add some ingredients first."}), 400
+    
+    data = request.json or {}
+    meal_type = data.get('mealType', 'Dinner')
+    count = _parse_recipe_count(data)
+    if count is None:
+        return jsonify({"error": f"count must be an integer between 1 and {MAX_RECIPE_COUNT}"}), 400
+    
+    cache_key = recipe_cache_key(ingredients_list, preferences, meal_type, count)
+    cached_recipes = get_cached_recipes(cache_key)
+    
+    def events():
+        if cached_recipes is not None:
+            for recipe in cached_recipes:
+                yield _sse("recipe", recipe)
+            yield _sse("done", {"count": len(cached_recipes), "cached": True})
+            return
+        
+        recipes = []
+        try:
+            for recipe in stream_recipes(ingredients_list, preferences, meal_type, count):
+                recipes.append(recipe)
+                yield _sse("recipe", recipe)
+        except LLMError as e:
+            yield _sse("error", {"error": e.error_code, "message": str(e)})
+            return
+        except Exception as e:
+            yield _sse("error", {"error": f"Failed to generate recipes: {str(e)}"})
+            return
+        
+        if len(recipes) >= count:
+            store_cached_recipes(cache_key, recipes)
+        yield _sse("done", {"count": len(recipes), "cached": False})
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+MAX_JOB_WAIT = 30  # seconds a poll may block waiting for a job to finish
+
+@app.route('/api/recipes/jobs', methods=['POST'])
+@jwt_required()
+def create_recipe_job():
+    """
+    Queue recipe generation in the background and return a job ID immediately.
+    Poll GET /api/recipes/jobs/<id> for the result. Submitting an identical
+    request again returns the existing job.
+    """
+    user = current_user_ref()
+    
+    ingredients_list, preferences = load_recipe_context(user)
+    if not ingredients_list:
+        return jsonify({"error": "No ingredients in your fridge. Please add some ingredients first."}), 400
+    
+    data = request.json or {}
+    meal_type = data.get('mealType', 'Dinner')
+    count = _parse_recipe_count(data)
+    if count is None:
+        return jsonify({"error": f"count must be an integer between 1 and {MAX_RECIPE_COUNT}"}), 400
+    
+    try:
+        job = submit_recipe_job(user, ingredients_list, preferences, meal_type, count)
+    except JobQueueFull as e:
+        return jsonify({"error": "queue_full", "message": str(e)}), 503
+    
+    response = jsonify(job.to_json())
+    response.status_code = 202
+    response.headers["Location"] = f"/api/recipes/jobs/{job.id}"
+    return response
+
+@app.route('/api/recipes/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_recipe_job_status(job_id):
+    """
+    Get a recipe job's status and, once done, its result
+    ({recipes, count, cached} as returned by /api/recipes/generate).
+    Pass ?wait=N to block up to N seconds for the job to finish.
+    """
+    user = current_user_ref()
+    
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), MAX_JOB_WAIT)
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    
+    job = get_recipe_job(job_id, user, wait)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_json()), 200
+
 # -------------------------
 # Saved Recipes Routes
 # -------------------------
 
 @app.route('/api/saved-recipes', methods=['GET'])
 @jwt_required()
+@conditional(SAVED_RECIPES)
 def get_saved_recipes():
-    """Get all saved recipes for the current user"""
-    current_user_id = get_jwt_identity()
-    user = User.objects(id=current_user_id).first()
-    
-    saved_recipes = SavedRecipe.objects(user=user).order_by('-saved_at')
-    return jsonify([recipe.to_json() for recipe in saved_recipes]), 200
+    """
+    Get the current user's saved recipes, newest first, a page at a time.
+    Query params: limit, cursor (from the previous page's X-Next-Cursor header,
+    absent on the last page) and fields (e.g. fields=name,tags,nutrition).
+    """
+    user = current_user_ref()
+    try:
+        limit = parse_page_size(request.args.get('limit'))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    try:
+        fields = parse_fields(request.args.get('fields'), SAVED_RECIPE_API_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    saved_recipes = SavedRecipe.objects(user=user).order_by('-saved_at', '-id').only(
+        *projection(fields, SAVED_RECIPE_API_FIELDS, 'saved_at')
+    ).as_pymongo()
+    try:
+        docs, next_cursor = paginate(saved_recipes, 'saved_at', request.args.get('cursor'), limit, descending=True)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = json_response([select(saved_recipe_row(doc), fields) for doc in docs])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+@app.route('/api/saved-recipes/<id>', methods=['GET'])
+@jwt_required()
+@conditional(SAVED_RECIPES)
+def get_saved_recipe(id):
+    """Get one saved recipe in full (or just ?fields=...)"""
+    user = current_user_ref()
+    try:
+        fields = parse_fields(request.args.get('fields'), SAVED_RECIPE_API_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    doc = SavedRecipe.objects(id=id, user=user).only(*projection(fields, SAVED_RECIPE_API_FIELDS)).as_pymongo().first()
+    if not doc:
+        return jsonify({"error": "Recipe not found"}), 404
+    return json_response(select(saved_recipe_row(doc), fields))
 
 @app.route('/api/saved-recipes', methods=['POST'])
 @jwt_required()
 def save_recipe():
     """Save a recipe to user's collection"""
-    current_user_id = get_jwt_identity()
-    user = User.objects(id=current_user_id).first()
+    user = current_user_ref()
     data = request.json
     
     # Check if recipe already exists (by name and user)
@@ -657,6 +1137,7 @@ def save_recipe():
             meal_type=data.get('mealType', '')
         )
         saved_recipe.save()
+        bump_version(user, SAVED_RECIPES)
         return jsonify(saved_recipe.to_json()), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -665,14 +1146,14 @@ def save_recipe():
 @jwt_required()
 def delete_saved_recipe(id):
     """Remove a saved recipe"""
-    current_user_id = get_jwt_identity()
-    user = User.objects(id=current_user_id).first()
+    user = current_user_ref()
     
     recipe = SavedRecipe.objects(id=id, user=user).first()
     if not recipe:
         return jsonify({"error": "Recipe not found"}), 404
     
     recipe.delete()
+    bump_version(user, SAVED_RECIPES)
     return jsonify({"message": "Recipe removed from saved"}), 200
 
 if __name__ == '__main__':
@@ -0,0 +1,152 @@
+# bench_json_extraction.py
+# Compare the single-pass JSONObjectStream extractor (llm_service.py) with the
+# previous fence-splitting / find-rfind / regex-comma-fix / json.loads chain on
+# a synthetic corpus of the malformed responses the LLM produces: code fences,
+# prose around the JSON, trailing commas, truncated arrays and one broken
+# record among good ones. Reports records recovered and parse time per case.
+# Responses captured in production (set LLM_CAPTURE_PATH, see llm_service.py)
+# can be replayed with --corpus; their expected count is the recovered count
+# at capture time.
+#
+#   python bench_json_extraction.py --records 5 --repeat 200
+#   python bench_json_extraction.py --corpus captured.jsonl
+
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+
+from llm_service import extract_json_objects
+
+
+def legacy_extract(response_text):
+    """The parsing chain generate_recipes used before JSONObjectStream"""
+    if "```json" in response_text:
+        response_text = response_text.split("```json")[1].split("```")[0].strip()
+    elif "```" in response_text:
+        response_text = response_text.split("```")[1].split("```")[0].strip()
+    try:
+        start_idx = response_text.find('[')
+        end_idx = response_text.rfind(']')
+        if start_idx != -1 and end_idx != -1:
+            recipes = json.loads(response_text[start_idx:end_idx+1])
+        else:
+            parsed = json.loads(response_text)
+            if "recipes" in parsed:
+                recipes = parsed["recipes"]
+            elif isinstance(parsed, list):
+                recipes = parsed
+            else:
+                recipes = [parsed] if parsed else []
+    except json.JSONDecodeError:
+        try:
+            fixed_json = re.sub(r',\s*([\]}])', r'\1', response_text)
+            if '[' in fixed_json and not fixed_json.strip().endswith(']'):
+                last_brace = fixed_json.rfind('}')
+                if last_brace != -1:
+                    fixed_json = fixed_json[:last_brace+1] + ']'
+            start_idx = fixed_json.find('[')
+            end_idx = fixed_json.rfind(']')
+            if start_idx == -1 or end_idx == -1:
+                return []
+            recipes = json.loads(fixed_json[start_idx:end_idx+1])
+        except Exception:
+            return []
+    return [r for r in recipes if isinstance(r, dict)] if isinstance(recipes, list) else []
+
+
+def _recipe(i):
+    return {
+        "name": f"Recipe {i} [v{i}]",
+        "description": "A quick {weeknight} meal, ready in \"30\" minutes",
+        "ingredients": [{"name": f"Item {n}", "quantity": "1", "unit": "pcs"} for n in range(6)],
+        "instructions": [f"Step {n}: stir, then simmer" for n in range(8)],
+        "nutrition": {"calories": 500, "protein": 30, "carbs": 40, "fat": 20},
+        "cookingTime": "30 minutes",
+        "difficulty": "Easy",
+        "tags": ["quick", "healthy"]
+    }
+
+def _array(records):
+    return json.dumps(records, indent=2)
+
+def _with_trailing_commas(text):
+    return re.sub(r'(["\d\]}])(\n\s*[\]}])', r'\1,\2', text)
+
+def _truncated(records):
+    text = _array(records)
+    last = text.rfind('"instructions"')  # cut inside the final record
+    return text[:last]
+
+def _broken(records):
+    # Unquoted key and a stray token in the middle record; the others are intact
+    bad = len(records) // 2
+    parts = [json.dumps(r) for r in records]
+    parts[bad] = parts[bad].replace('"difficulty": "Easy"', 'difficulty: Easy ???', 1)
+    return "[\n" + ",\n".join(parts) + "\n]"
+
+def _single_key(records):
+    # Records that happen to have one key must not be flattened into their list
+    return json.dumps([{"ingredients": r["ingredients"]} for r in records])
+
+def corpus(n):
+    """(case, response text, records expected) for n records per response"""
+    records = [_recipe(i) for i in range(n)]
+    array = _array(records)
+    return [
+        ("clean", array, n),
+        ("code_fence", f"```json\n{array}\n```", n),
+        ("prose", f"Here are {n} recipes [as requested]:\n{array}\nEnjoy {{and}} let me know!", n),
+        ("wrapped", json.dumps({"recipes": records}), n),
+        ("trailing_commas", _with_trailing_commas(array), n),
+        ("fenced_commas", f"Sure!\n```json\n{_with_trailing_commas(array)}\n```\nHope this helps.", n),
+        ("truncated", _truncated(records), n - 1),
+        ("broken_record", _broken(records), n - 1),
+        ("broken_fenced", f"```json\n{_broken(records)}\n```", n - 1),
+        ("stray_bracket", f"Recipes below [see notes:\n{array}\nEnjoy!", n),
+        ("single_key", _single_key(records), n),
+    ]
+
+def load_corpus(path):
+    """(case, response text, records expected) for each captured response in a JSON Lines file"""
+    with open(path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return [(f"captured_{i}", entry["text"], entry.get("recovered", 0)) for i, entry in enumerate(entries)]
+
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare JSON extraction from malformed LLM responses")
+    parser.add_argument("--records", type=int, default=5, help="records per response")
+    parser.add_argument("--repeat", type=int, default=200, help="runs per extractor (best is reported)")
+    parser.add_argument("--corpus", help="JSON Lines file of captured responses instead of the synthetic corpus")
+    args = parser.parse_args(argv)
+    # Skipped records are logged per response; keep that out of the output and the timings
+    logging.getLogger("llm_service").setLevel(logging.ERROR)
+
+    print(f"{'case':<16} {'expect':>6} {'legacy':>6} {'stream':>6} {'legacy_t':>10} {'stream_t':>10}")
+    totals = {"expect": 0, "legacy": 0, "stream": 0}
+    cases = load_corpus(args.corpus) if args.corpus else corpus(args.records)
+    for case, text, expected in cases:
+        legacy = len(legacy_extract(text))
+        stream = len(extract_json_objects(text))
+        slow = _time(lambda: legacy_extract(text), args.repeat)
+        fast = _time(lambda: extract_json_objects(text), args.repeat)
+        totals["expect"] += expected
+        totals["legacy"] += legacy
+        totals["stream"] += stream
+        print(f"{case:<16} {expected:>6} {legacy:>6} {stream:>6} {slow * 1e6:>8.1f}us {fast * 1e6:>8.1f}us")
+    print(f"{'total':<16} {totals['expect']:>6} {totals['legacy']:>6} {totals['stream']:>6}")
+    return 0 if totals["stream"] == totals["expect"] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
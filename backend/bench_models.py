@@ -0,0 +1,111 @@
+# bench_models.py
+# Compare model tiers per LLM task on a recorded corpus (see llm_replay).
+# Every recorded prompt is re-sent once per tier; the report shows success rate,
+# parse rate, latency percentiles and completion tokens for each task and tier.
+#
+#   LLM_RECORD_FILE=corpus.jsonl python app.py                 # collect prompts
+#   LLM_RECORD_FILE=bench.jsonl python bench_models.py corpus.jsonl   # live run, recorded
+#   LLM_TRANSPORT=replay LLM_REPLAY_FILE=bench.jsonl python bench_models.py corpus.jsonl
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import defaultdict
+
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
+
+from llm_client import chat_completion, LLMError
+from llm_routing import TIERS, get_route
+from llm_service import extract_json_objects
+
+
+def load_corpus(path, tasks=None, limit=None):
+    """Unique recorded prompts grouped by task (recordings without messages are skipped)"""
+    corpus = defaultdict(dict)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            task = record.get("task") or "other"
+            if not record.get("messages") or (tasks and task not in tasks):
+                continue
+            if limit and len(corpus[task]) >= limit:
+                continue
+            corpus[task].setdefault(record["prompt_key"], record)
+    return {task: list(records.values()) for task, records in corpus.items()}
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+def run_tier(task, records, model, timeout):
+    stats = {"calls": 0, "ok": 0, "parsed": 0, "errors": defaultdict(int), "latency": [], "tokens": []}
+    for record in records:
+        stats["calls"] += 1
+        started = time.monotonic()
+        try:
+            completion = chat_completion(
+                timeout=timeout,
+                task=task,
+                model=model,
+                messages=record["messages"],
+                **(record.get("options") or {})
+            )
+        except LLMError as e:
+            stats["errors"][e.error_code] += 1
+            continue
+        stats["latency"].append(time.monotonic() - started)
+        stats["ok"] += 1
+        if extract_json_objects(completion.choices[0].message.content):
+            stats["parsed"] += 1
+        usage = getattr(completion, "usage", None)
+        if usage is not None:
+            stats["tokens"].append(usage.completion_tokens)
+    return stats
+
+def _format_row(task, tier, stats):
+    def secs(value):
+        return f"{value:.2f}s" if value is not None else "-"
+    calls = stats["calls"] or 1
+    tokens = sum(stats["tokens"]) / len(stats["tokens"]) if stats["tokens"] else None
+    errors = ",".join(f"{code}={n}" for code, n in sorted(stats["errors"].items())) or "-"
+    return (
+        f"{task:<18} {tier:<8} {stats['calls']:>5} {stats['ok'] / calls:>6.0%} {stats['parsed'] / calls:>7.0%} "
+        f"{secs(_percentile(stats['latency'], 0.5)):>7} {secs(_percentile(stats['latency'], 0.95)):>7} "
+        f"{(f'{tokens:.0f}' if tokens is not None else '-'):>7}  {errors}"
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare model tiers per LLM task on a recorded corpus")
+    parser.add_argument("corpus", help="JSONL file written by RecordingTransport")
+    parser.add_argument("--tiers", default=",".join(TIERS), help="comma-separated tier names")
+    parser.add_argument("--tasks", help="comma-separated tasks (default: all in the corpus)")
+    parser.add_argument("--limit", type=int, help="max prompts per task")
+    args = parser.parse_args(argv)
+
+    tiers = [tier.strip() for tier in args.tiers.split(",") if tier.strip()]
+    unknown = [tier for tier in tiers if tier not in TIERS]
+    if unknown:
+        parser.error(f"unknown tiers: {', '.join(unknown)}")
+    tasks = set(args.tasks.split(",")) if args.tasks else None
+    corpus = load_corpus(args.corpus, tasks, args.limit)
+    if not corpus:
+        print("No recorded prompts with messages found in the corpus.")
+        return 1
+
+    print(f"{'task':<18} {'tier':<8} {'calls':>5} {'ok':>6} {'parsed':>7} {'p50':>7} {'p95':>7} {'tokens':>7}  errors")
+    for task, records in sorted(corpus.items()):
+        budget = get_route(task).budget
+        for tier in tiers:
+            print(_format_row(task, tier, run_tier(task, records, TIERS[tier], budget)))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
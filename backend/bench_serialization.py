@@ -0,0 +1,87 @@
+# bench_serialization.py
+# Compare the Document + to_json() + jsonify path with the raw as_pymongo()
+# path from serializers.py, per model. Works on synthetic raw documents, so it
+# measures serialization CPU only (no database needed).
+#
+#   python bench_serialization.py --rows 500 --repeat 50
+
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+
+from bson import ObjectId
+import orjson
+
+from models import Ingredient, SavedRecipe, DailyCalorieLog
+from serializers import ingredient_row, saved_recipe_row, calorie_log_row
+
+
+def _ingredient(i):
+    return {
+        "_id": ObjectId(), "user": ObjectId(), "name": f"Ingredient {i}", "quantity": str(i % 5 + 1),
+        "unit": "g", "expiry_date": "2026-01-01", "calories": random.uniform(0, 500),
+        "protein": random.uniform(0, 30), "carbs": random.uniform(0, 60), "fat": random.uniform(0, 30),
+        "created_at": datetime.datetime.utcnow()
+    }
+
+def _saved_recipe(i):
+    ingredients = [{"name": f"Item {n}", "quantity": "1", "unit": "pcs"} for n in range(6)]
+    return {
+        "_id": ObjectId(), "user": ObjectId(), "name": f"Recipe {i}", "description": "A recipe " * 10,
+        "available_ingredients": ingredients, "missing_ingredients": ingredients[:2],
+        "instructions": [f"Step {n}" for n in range(8)],
+        "nutrition": {"calories": 500, "protein": 30, "carbs": 40, "fat": 20},
+        "cooking_time": "30 minutes", "difficulty": "Easy", "tags": ["quick", "healthy"],
+        "meal_type": "Dinner", "saved_at": datetime.datetime.utcnow()
+    }
+
+def _calorie_log(i):
+    return {
+        "_id": ObjectId(), "user": ObjectId(), "date": datetime.datetime(2026, 1, 1 + i % 28),
+        "calories": random.uniform(50, 900), "meal_type": "Lunch", "note": "",
+        "created_at": datetime.datetime.utcnow()
+    }
+
+MODELS = {
+    "ingredient": (Ingredient, _ingredient, ingredient_row),
+    "saved_recipe": (SavedRecipe, _saved_recipe, saved_recipe_row),
+    "calorie_log": (DailyCalorieLog, _calorie_log, calorie_log_row)
+}
+
+
+def _document_path(model, docs):
+    return json.dumps([model._from_son(doc).to_json() for doc in docs]).encode()
+
+def _raw_path(row, docs):
+    return orjson.dumps([row(doc) for doc in docs])
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare to_json() and raw serialization per model")
+    parser.add_argument("--rows", type=int, default=500, help="documents per response")
+    parser.add_argument("--repeat", type=int, default=50, help="runs per path (best is reported)")
+    args = parser.parse_args(argv)
+
+    print(f"{'model':<14} {'rows':>5} {'to_json':>10} {'raw':>10} {'speedup':>8}")
+    for name, (model, make, row) in MODELS.items():
+        docs = [make(i) for i in range(args.rows)]
+        if json.loads(_document_path(model, docs)) != json.loads(_raw_path(row, docs)):
+            print(f"{name}: raw path output differs from to_json()")
+            return 1
+        slow = _time(lambda: _document_path(model, docs), args.repeat)
+        fast = _time(lambda: _raw_path(row, docs), args.repeat)
+        print(f"{name:<14} {args.rows:>5} {slow * 1000:>8.2f}ms {fast * 1000:>8.2f}ms {slow / fast:>7.1f}x")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,323 @@
+# cache.py
+# Two-tier caching for LLM results: a per-process LRU in front of a shared
+# MongoDB collection so every worker benefits from a generation.
+
+import os
+import re
+import json
+import hashlib
+import threading
+import time
+import datetime
+from collections import OrderedDict
+
+from models import RecipeCacheEntry, NutritionCacheEntry
+from llm_service import (
+    generate_recipes,
+    get_nutrition_info,
+    get_nutrition_info_batch,
+    is_fallback_result,
+    RECIPE_PROMPT_VERSION,
+    DEFAULT_RECIPE_COUNT
+)
+
+RECIPE_CACHE_TTL = int(os.getenv("RECIPE_CACHE_TTL", 6 * 60 * 60))  # seconds
+RECIPE_CACHE_MAX_ENTRIES = int(os.getenv("RECIPE_CACHE_MAX_ENTRIES", 50000))
+RECIPE_CACHE_LRU_SIZE = int(os.getenv("RECIPE_CACHE_LRU_SIZE", 256))
+NUTRITION_CACHE_LRU_SIZE = int(os.getenv("NUTRITION_CACHE_LRU_SIZE", 4096))
+NUTRITION_CACHE_TTL = int(os.getenv("NUTRITION_CACHE_TTL", 30 * 24 * 60 * 60))  # seconds
+
+
+class LRUCache:
+    """Small thread-safe LRU cache with per-entry expiry"""
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return item[0] if item else None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class _FlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key: the first caller runs fn,
+    everyone else arriving before it finishes waits and shares its result.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _FlightCall()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+def normalize_ingredient_name(name):
+    """Case- and whitespace-insensitive key for ingredient names"""
+    return re.sub(r'\s+', ' ', (name or '').strip()).casefold()
+
+
+# -------------------------
+# Recipe cache
+# -------------------------
+
+_recipe_lru = LRUCache(RECIPE_CACHE_LRU_SIZE, ttl=RECIPE_CACHE_TTL)
+
+def recipe_cache_key(ingredients, preferences, meal_type, count=DEFAULT_RECIPE_COUNT):
+    """
+    Canonical fingerprint of everything that shapes the recipe prompt.
+    Fridge order, list order in preferences and name casing do not matter.
+    """
+    fridge = sorted(
+        (
+            (ing.get('name') or '').strip().lower(),
+            str(ing.get('quantity') or '').strip(),
+            (ing.get('unit') or '').strip().lower()
+        )
+        for ing in ingredients
+    )
+    prefs = {
+        "dietType": preferences.get('dietType'),
+        "spiceLevel": preferences.get('spiceLevel'),
+        "allergies": sorted(preferences.get('allergies') or []),
+        "goals": sorted(preferences.get('goals') or []),
+        "conditions": sorted(preferences.get('conditions') or []),
+        "notes": (preferences.get('notes') or '').strip()
+    }
+    payload = json.dumps(
+        {"v": RECIPE_PROMPT_VERSION, "fridge": fridge, "prefs": prefs, "mealType": meal_type, "count": count},
+        sort_keys=True,
+        separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def get_cached_recipes(key):
+    """Look up recipes in the local LRU, then the shared Mongo tier"""
+    recipes = _recipe_lru.get(key)
+    if recipes is not None:
+        return recipes
+
+    entry = RecipeCacheEntry.objects(key=key, expires_at__gt=datetime.datetime.utcnow()).first()
+    if not entry:
+        return None
+
+    # Keep the local copy no longer than the shared one
+    remaining = (entry.expires_at - datetime.datetime.utcnow()).total_seconds()
+    _recipe_lru.set(key, entry.recipes, ttl=max(remaining, 1))
+    return entry.recipes
+
+def store_cached_recipes(key, recipes):
+    """Write recipes to both tiers and trim the shared tier if it grew too large"""
+    now = datetime.datetime.utcnow()
+    _recipe_lru.set(key, recipes)
+    RecipeCacheEntry.objects(key=key).update_one(
+        set__recipes=recipes,
+        set__created_at=now,
+        set__expires_at=now + datetime.timedelta(seconds=RECIPE_CACHE_TTL),
+        upsert=True
+    )
+    _evict_oldest_recipes()
+
+def _evict_oldest_recipes():
+    collection = RecipeCacheEntry._get_collection()
+    excess = collection.estimated_document_count() - RECIPE_CACHE_MAX_ENTRIES
+    if excess <= 0:
+        return
+    oldest = collection.find({}, {"_id": 1}).sort("created_at", 1).limit(excess)
+    collection.delete_many({"_id": {"$in": [doc["_id"] for doc in oldest]}})
+
+def cached_generate_recipes(ingredients, preferences, meal_type="Dinner", count=DEFAULT_RECIPE_COUNT):
+    """
+    generate_recipes() behind the recipe cache.
+    Returns (recipes, cached). Fallback results, and results with fewer than
+    count recipes (usually a truncated response), are never stored.
+    """
+    key = recipe_cache_key(ingredients, preferences, meal_type, count)
+    recipes = get_cached_recipes(key)
+    if recipes is not None:
+        return recipes, True
+
+    recipes = generate_recipes(ingredients, preferences, meal_type, count)
+    if len(recipes) >= count and not is_fallback_result(recipes):
+        store_cached_recipes(key, recipes)
+    return recipes, False
+
+
+# -------------------------
+# Nutrition cache
+# -------------------------
+
+_nutrition_lru = LRUCache(NUTRITION_CACHE_LRU_SIZE, ttl=NUTRITION_CACHE_TTL)
+_nutrition_flight = SingleFlight()
+
+def _entry_to_nutrition(entry):
+    return {
+        "calories": entry.calories,
+        "protein": entry.protein,
+        "carbs": entry.carbs,
+        "fat": entry.fat,
+        "shelfLifeDays": entry.shelf_life_days
+    }
+
+def _with_expiry(cached):
+    """Turn a cached record into the get_nutrition_info() response shape"""
+    result = {k: cached[k] for k in ("calories", "protein", "carbs", "fat")}
+    if cached.get("shelfLifeDays") is not None:
+        expiry = datetime.date.today() + datetime.timedelta(days=cached["shelfLifeDays"])
+        result["suggestedExpiryDate"] = expiry.isoformat()
+    return result
+
+def _shelf_life_days(nutrition):
+    """Days from today to the suggested expiry; None if missing or already past (not worth sharing)"""
+    try:
+        expiry = datetime.datetime.strptime(nutrition.get("suggestedExpiryDate", ""), "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+    days = (expiry - datetime.date.today()).days
+    return days if days >= 0 else None
+
+def _load_nutrition(key):
+    cached = _nutrition_lru.get(key)
+    if cached is not None:
+        return cached
+    # Entries past expires_at (or written before it existed) are refreshed; the TTL monitor lags
+    entry = NutritionCacheEntry.objects(name_key=key, expires_at__gt=datetime.datetime.utcnow()).first()
+    if not entry:
+        return None
+    cached = _entry_to_nutrition(entry)
+    _nutrition_lru.set(key, cached)
+    return cached
+
+def _store_nutrition(key, name, nutrition):
+    cached = {
+        "calories": nutrition["calories"],
+        "protein": nutrition["protein"],
+        "carbs": nutrition["carbs"],
+        "fat": nutrition["fat"],
+        "shelfLifeDays": _shelf_life_days(nutrition)
+    }
+    now = datetime.datetime.utcnow()
+    NutritionCacheEntry.objects(name_key=key).update_one(
+        set__name=name,
+        set__calories=cached["calories"],
+        set__protein=cached["protein"],
+        set__carbs=cached["carbs"],
+        set__fat=cached["fat"],
+        set__shelf_life_days=cached["shelfLifeDays"],
+        set__expires_at=now + datetime.timedelta(seconds=NUTRITION_CACHE_TTL),
+        set_on_insert__created_at=now,
+        upsert=True
+    )
+    _nutrition_lru.set(key, cached)
+    return cached
+
+def _fetch_nutrition(key, name):
+    # Another worker may have filled the shared tier while we queued
+    cached = _load_nutrition(key)
+    if cached is not None:
+        return _with_expiry(cached)
+
+    nutrition = get_nutrition_info(name)
+    if nutrition:
+        # Answer from the stored form too, so a past expiry date is dropped here as well
+        return _with_expiry(_store_nutrition(key, name, nutrition))
+    return nutrition
+
+def cached_nutrition_info(ingredient_name):
+    """
+    get_nutrition_info() behind the global nutrition cache.
+    Concurrent misses for the same name in this process share one LLM call
+    (and its LLMError, if any); failures are never cached.
+    """
+    key = normalize_ingredient_name(ingredient_name)
+    cached = _load_nutrition(key)
+    if cached is not None:
+        return _with_expiry(cached)
+    return _nutrition_flight.do(key, lambda: _fetch_nutrition(key, ingredient_name))
+
+def cached_nutrition_info_batch(ingredient_names):
+    """
+    Batch form of cached_nutrition_info(): every cache miss is resolved by one
+    multi-item LLM call. Returns a dict of name -> nutrition (None if unanswered).
+    """
+    results = {}
+    missing = {}
+    answers = {}
+    for name in ingredient_names:
+        key = normalize_ingredient_name(name)
+        cached = _load_nutrition(key)
+        if cached is not None:
+            results[name] = _with_expiry(cached)
+        else:
+            missing.setdefault(key, name)
+
+    if missing:
+        answers = get_nutrition_info_batch(list(missing.values()))
+        for key, name in missing.items():
+            nutrition = answers.get(name)
+            if nutrition:
+                answers[name] = _with_expiry(_store_nutrition(key, name, nutrition))
+
+    for name in ingredient_names:
+        if name not in results:
+            results[name] = answers.get(missing[normalize_ingredient_name(name)])
+    return results
@@ -0,0 +1,112 @@
+# calorie_rollups.py
+# Materialized per-day calorie totals. add_calorie_log increments the day's
+# DailyCalorieRollup with $inc, so a summary reads one small document per day
+# instead of every logged entry in the range. At startup the rollups are
+# compared with the logs; entries logged before rollups existed (or by an older
+# deploy) trigger a background backfill, so summaries never silently omit them.
+#
+#   flask --app app backfill-calorie-rollups   # rebuild rollups from the raw logs
+
+import os
+import datetime
+import logging
+import threading
+
+from pymongo import UpdateOne
+
+from models import DailyCalorieLog, DailyCalorieRollup
+
+BACKFILL_BATCH_SIZE = 1000
+# "auto" backfills at startup when the rollups miss logged entries, "off" leaves it to the CLI
+CALORIE_ROLLUP_BACKFILL = os.getenv("CALORIE_ROLLUP_BACKFILL", "auto")
+
+logger = logging.getLogger(__name__)
+
+
+def _as_date(value):
+    # DateFields come back from pymongo as midnight datetimes
+    return value.date() if isinstance(value, datetime.datetime) else value
+
+def record_calories(user, date, calories):
+    """Add one logged entry to the user's rollup for date (one upsert)"""
+    DailyCalorieRollup.objects(user=user, date=date).update_one(
+        inc__calories=calories,
+        inc__entries=1,
+        set__updated_at=datetime.datetime.utcnow(),
+        upsert=True
+    )
+
+def daily_totals(user, start_date, end_date):
+    """[(date, calories, entries)] for each day in the range that has entries, in date order"""
+    docs = DailyCalorieRollup.objects(
+        user=user,
+        date__gte=start_date,
+        date__lte=end_date
+    ).order_by('date').only('date', 'calories', 'entries').as_pymongo()
+    return [
+        (_as_date(doc["date"]), doc.get("calories", 0), doc.get("entries", 0))
+        for doc in docs
+        if doc.get("entries", 0) > 0
+    ]
+
+def backfill_rollups(user=None):
+    """
+    Recompute rollups from DailyCalorieLog with a $group pipeline, for one user
+    or everyone. Overwrites the stored totals, so run it while entries are not
+    being logged for the affected users. Returns the number of days written.
+    """
+    queryset = DailyCalorieLog.objects(user=user) if user is not None else DailyCalorieLog.objects()
+    groups = queryset.aggregate([
+        {"$group": {
+            "_id": {"user": "$user", "date": "$date"},
+            "calories": {"$sum": "$calories"},
+            "entries": {"$sum": 1}
+        }}
+    ])
+
+    collection = DailyCalorieRollup._get_collection()
+    now = datetime.datetime.utcnow()
+    written = 0
+    batch = []
+    for group in groups:
+        batch.append(UpdateOne(
+            {"user": group["_id"]["user"], "date": group["_id"]["date"]},
+            {"$set": {"calories": group["calories"], "entries": group["entries"], "updated_at": now}},
+            upsert=True
+        ))
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            collection.bulk_write(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        collection.bulk_write(batch, ordered=False)
+        written += len(batch)
+    return written
+
+def unrolled_entries():
+    """Logged entries not counted in any rollup (0 when rollups and logs agree)"""
+    rolled = list(DailyCalorieRollup.objects.aggregate([
+        {"$group": {"_id": None, "entries": {"$sum": "$entries"}}}
+    ]))
+    return DailyCalorieLog.objects.count() - (rolled[0]["entries"] if rolled else 0)
+
+def _backfill_in_background(missing):
+    try:
+        written = backfill_rollups()
+        logger.info(f"Backfilled {written} daily calorie rollups ({missing} entries were missing)")
+    except Exception as e:
+        logger.warning(f"Calorie rollup backfill failed: {e}")
+
+def ensure_rollups():
+    """
+    Start a background backfill when logged entries are missing from the
+    rollups, e.g. the first start after rollups were introduced. Returns the
+    number of missing entries (0: nothing to do).
+    """
+    if CALORIE_ROLLUP_BACKFILL == "off":
+        return 0
+    missing = unrolled_entries()
+    if missing > 0:
+        logger.warning(f"{missing} logged calorie entries missing from rollups; backfilling")
+        threading.Thread(target=_backfill_in_background, args=(missing,), daemon=True).start()
+    return missing
@@ -0,0 +1,285 @@
+# catalog.py
+# In-process snapshot of the CommonIngredient catalog.
+# Each worker keeps the CATALOG_SNAPSHOT_SIZE most popular entries in memory,
+# keyed by normalized name and indexed for search; a full imported catalog
+# (hundreds of thousands of rows) would cost ~1 GB and ~40 s per rebuild in every
+# worker. Names outside the snapshot are looked up and prefix-searched in Mongo
+# through the indexed name_key / base_key fields. Writers bump a CatalogVersion
+# document; readers poll it at most every CATALOG_REFRESH_INTERVAL seconds. When
+# it moved, or the snapshot is older than CATALOG_MAX_AGE (popularity counts
+# change without a version bump), a background thread builds the new snapshot
+# from raw documents while requests keep using the old one.
+# Ingredient search combines the snapshot's index with a small per-user index of
+# custom ingredients and fridge usage, cached briefly in each worker.
+
+import os
+import re
+import time
+import datetime
+import logging
+import threading
+from collections import Counter
+
+from pymongo import UpdateOne
+from mongoengine.queryset.visitor import Q
+
+from models import CommonIngredient, CatalogVersion, UserDefinedIngredient, Ingredient
+from cache import LRUCache, normalize_ingredient_name
+from search_index import SearchIndex
+
+COMMON_INGREDIENTS = "common_ingredients"
+CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", 30))  # seconds
+CATALOG_SNAPSHOT_SIZE = int(os.getenv("CATALOG_SNAPSHOT_SIZE", 20000))  # most popular entries kept in memory
+CATALOG_MAX_AGE = float(os.getenv("CATALOG_MAX_AGE", 3600))  # seconds before a rebuild picks up popularity
+TAIL_SEARCH_MIN_LENGTH = 3  # shorter queries are answered from the snapshot alone
+KEY_BACKFILL_BATCH_SIZE = 1000
+USER_SEARCH_CACHE_SIZE = int(os.getenv("USER_SEARCH_CACHE_SIZE", 2048))
+USER_SEARCH_TTL = float(os.getenv("USER_SEARCH_TTL", 60))  # seconds, bounds staleness across workers
+CATALOG_FIELDS = ('id', 'name', 'default_unit', 'calories', 'protein', 'carbs', 'fat', 'category', 'popularity')
+
+logger = logging.getLogger(__name__)
+
+
+def catalog_key(name):
+    """Catalog name without its qualifier: "Milk (Whole)" -> "milk" """
+    return normalize_ingredient_name(re.sub(r"\s*\(.*?\)", "", name or ""))
+
+
+class CatalogItem:
+    """Read-only catalog entry built from a raw CommonIngredient document"""
+    __slots__ = ('id', 'name', 'default_unit', 'calories', 'protein', 'carbs', 'fat', 'category', 'popularity')
+
+    def __init__(self, doc):
+        self.id = doc["_id"]
+        self.name = doc.get("name")
+        self.default_unit = doc.get("default_unit", "g")
+        self.calories = doc.get("calories", 0)
+        self.protein = doc.get("protein", 0)
+        self.carbs = doc.get("carbs", 0)
+        self.fat = doc.get("fat", 0)
+        self.category = doc.get("category")
+        self.popularity = doc.get("popularity", 0)
+
+    def to_json(self):
+        # Same shape as CommonIngredient.to_json()
+        return {
+            "id": str(self.id),
+            "name": self.name,
+            "unit": self.default_unit,
+            "calories": self.calories,
+            "protein": self.protein,
+            "carbs": self.carbs,
+            "fat": self.fat,
+            "category": self.category
+        }
+
+
+class CatalogSnapshot:
+    """
+    Immutable view of the catalog at one version. When complete is False it
+    holds only the most popular entries and falls back to Mongo for the rest.
+    """
+
+    def __init__(self, items, version, complete=True):
+        self.version = version
+        self.complete = complete
+        self.loaded_at = time.monotonic()
+        self.items = sorted(items, key=lambda item: normalize_ingredient_name(item.name))
+        self.by_name = {normalize_ingredient_name(item.name): item for item in self.items}
+        # Bare names also find qualified entries ("milk" -> "Milk (Whole)"), exact names win
+        self.by_base_name = {}
+        for item in self.items:
+            self.by_base_name.setdefault(catalog_key(item.name), item)
+        self.by_base_name.update(self.by_name)
+        self.index = SearchIndex((item.name, item, item.popularity) for item in self.items)
+
+    def get(self, name):
+        """Entry whose name matches exactly, ignoring case and spacing"""
+        key = normalize_ingredient_name(name)
+        item = self.by_name.get(key)
+        if item is None and not self.complete:
+            doc = CommonIngredient.objects(name_key=key).only(*CATALOG_FIELDS).as_pymongo().first()
+            item = CatalogItem(doc) if doc else None
+        return item
+
+    def resolve(self, name):
+        """Like get(), but a bare name also matches a qualified entry"""
+        key = normalize_ingredient_name(name)
+        return self.resolve_many([key]).get(key)
+
+    def resolve_many(self, keys):
+        """
+        {key: entry} for the normalized keys that resolve. Exact names win over
+        bare-name matches, and snapshot entries over the rest of the catalog,
+        which is searched with one query for all misses.
+        """
+        found = {key: self.by_name[key] for key in keys if key in self.by_name}
+        missing = [key for key in keys if key not in found]
+        if not missing or self.complete:
+            found.update((key, self.by_base_name[key]) for key in missing if key in self.by_base_name)
+            return found
+
+        exact, base = {}, {}
+        docs = CommonIngredient.objects(
+            Q(name_key__in=missing) | Q(base_key__in=missing)
+        ).order_by('-popularity').only(*CATALOG_FIELDS, 'name_key', 'base_key').as_pymongo()
+        for doc in docs:
+            if doc.get("name_key") in missing:
+                exact.setdefault(doc["name_key"], CatalogItem(doc))
+            if doc.get("base_key") in missing:
+                base.setdefault(doc["base_key"], CatalogItem(doc))
+        for key in missing:
+            item = exact.get(key) or self.by_base_name.get(key) or base.get(key)
+            if item:
+                found[key] = item
+        return found
+
+    def search(self, query, limit=10, usage=None):
+        """Ranked (score, item) matches for a partial or misspelled name"""
+        results = self.index.search(query, limit, usage)
+        key = normalize_ingredient_name(query)
+        if self.complete or len(key) < TAIL_SEARCH_MIN_LENGTH:
+            return results
+        # Prefix matches outside the snapshot, scored the same way (no fuzzy matching there)
+        docs = CommonIngredient.objects(name_key__startswith=key).only(*CATALOG_FIELDS).limit(limit * 2).as_pymongo()
+        tail = [CatalogItem(doc) for doc in docs if normalize_ingredient_name(doc.get("name")) not in self.by_name]
+        if tail:
+            results.extend(SearchIndex((item.name, item, item.popularity) for item in tail).search(query, limit, usage))
+            results.sort(key=lambda entry: -entry[0])
+        return results[:limit]
+
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+_rebuilding = threading.Event()
+
+def _current_version():
+    doc = CatalogVersion.objects(name=COMMON_INGREDIENTS).only('version').first()
+    return doc.version if doc else 0
+
+def _load_snapshot(version):
+    docs = CommonIngredient.objects().order_by('-popularity').only(*CATALOG_FIELDS).limit(CATALOG_SNAPSHOT_SIZE + 1)
+    items = [CatalogItem(doc) for doc in docs.as_pymongo()]
+    complete = len(items) <= CATALOG_SNAPSHOT_SIZE
+    if not complete:
+        # Entries outside the snapshot are found by key; older rows may lack one
+        fixed = backfill_catalog_keys()
+        if fixed:
+            logger.info(f"Added lookup keys to {fixed} catalog entries")
+    return CatalogSnapshot(items[:CATALOG_SNAPSHOT_SIZE], version, complete)
+
+def _rebuild(version):
+    global _snapshot
+    try:
+        _snapshot = _load_snapshot(version)
+    except Exception as e:
+        logger.warning(f"Catalog reload failed: {e}")
+    finally:
+        _rebuilding.clear()
+
+def get_catalog():
+    """
+    The current snapshot. The first call loads it; after that a changed catalog
+    version (or a snapshot older than CATALOG_MAX_AGE) starts a background
+    rebuild and the old snapshot is served until the new one is swapped in.
+    """
+    global _snapshot, _checked_at
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - _checked_at < CATALOG_REFRESH_INTERVAL:
+        return snapshot
+
+    # One thread polls; the others keep serving the snapshot they have
+    if snapshot is not None and not _lock.acquire(blocking=False):
+        return snapshot
+    if snapshot is None:
+        _lock.acquire()
+    try:
+        if _snapshot is not None and time.monotonic() - _checked_at < CATALOG_REFRESH_INTERVAL:
+            return _snapshot
+        version = _current_version()
+        if _snapshot is None:
+            _snapshot = _load_snapshot(version)
+        elif (
+            (_snapshot.version != version or time.monotonic() - _snapshot.loaded_at > CATALOG_MAX_AGE)
+            and not _rebuilding.is_set()
+        ):
+            _rebuilding.set()
+            threading.Thread(target=_rebuild, args=(version,), daemon=True).start()
+        _checked_at = time.monotonic()
+        return _snapshot
+    finally:
+        _lock.release()
+
+def backfill_catalog_keys():
+    """
+    Set name_key / base_key on catalog entries written before those fields
+    existed, so lookups outside the snapshot find them. Returns the number fixed.
+    """
+    collection = CommonIngredient._get_collection()
+    fixed = 0
+    batch = []
+    for doc in collection.find({"name_key": {"$exists": False}}, {"name": 1}):
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {
+            "name_key": normalize_ingredient_name(doc.get("name")),
+            "base_key": catalog_key(doc.get("name"))
+        }}))
+        if len(batch) >= KEY_BACKFILL_BATCH_SIZE:
+            collection.bulk_write(batch, ordered=False)
+            fixed += len(batch)
+            batch = []
+    if batch:
+        collection.bulk_write(batch, ordered=False)
+        fixed += len(batch)
+    return fixed
+
+def bump_catalog_version():
+    """Record a catalog change so every worker reloads on its next poll (this one on its next call)"""
+    global _checked_at
+    CatalogVersion.objects(name=COMMON_INGREDIENTS).update_one(
+        inc__version=1,
+        set__updated_at=datetime.datetime.utcnow(),
+        upsert=True
+    )
+    _checked_at = 0.0
+
+
+# -------------------------
+# Ingredient search
+# -------------------------
+
+_user_indexes = LRUCache(USER_SEARCH_CACHE_SIZE, ttl=USER_SEARCH_TTL)
+
+def _user_search_data(user):
+    """(index of the user's custom ingredients, fridge usage by name), cached per worker"""
+    key = str(user.pk)
+    data = _user_indexes.get(key)
+    if data is None:
+        custom = list(UserDefinedIngredient.objects(user=user))
+        usage = Counter(
+            normalize_ingredient_name(doc["name"])
+            for doc in Ingredient.objects(user=user).only('name').as_pymongo()
+        )
+        data = (SearchIndex((item.name, item, 0) for item in custom), usage)
+        _user_indexes.set(key, data)
+    return data
+
+def invalidate_user_search(user):
+    """Drop this worker's cached search data for user after their ingredients change"""
+    _user_indexes.pop(str(user.pk))
+
+def search_ingredients(user, query, limit=10):
+    """
+    Autocomplete over common ingredients and the user's custom ones, ranked by
+    match quality, popularity and the user's own fridge usage. Custom ingredients
+    win ties and shadow common entries with the same name.
+    """
+    custom_index, usage = _user_search_data(user)
+    results = [(score + 1, item) for score, item in custom_index.search(query, limit, usage)]
+    custom_names = {normalize_ingredient_name(item.name) for _, item in results}
+    results.extend(
+        (score, item) for score, item in get_catalog().search(query, limit, usage)
+        if normalize_ingredient_name(item.name) not in custom_names
+    )
+    results.sort(key=lambda entry: -entry[0])
+    return [item for _, item in results[:limit]]
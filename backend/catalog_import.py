@@ -0,0 +1,181 @@
+# catalog_import.py
+# Streaming importer for the CommonIngredient catalog.
+# Reads a food-composition dataset row by row (CSV or JSON Lines), normalizes
+# names and units, and upserts by name in batched bulk_write calls, so memory
+# stays bounded by one batch whatever the file size. After every batch the row
+# count is written to a checkpoint file; --resume skips rows already loaded.
+#
+#   flask --app app import-catalog foods.csv
+#   flask --app app import-catalog foods.jsonl --resume
+#   flask --app app import-catalog foods.csv --map name=Description --map calories="Energy (kcal)"
+
+import os
+import re
+import csv
+import json
+import time
+
+from pymongo import UpdateOne
+
+from models import CommonIngredient
+from ingredient_parser import UNIT_ALIASES
+from cache import normalize_ingredient_name
+from catalog import bump_catalog_version, catalog_key
+
+IMPORT_BATCH_SIZE = 1000
+PROGRESS_EVERY = 50000  # rows
+
+# Column names recognised per catalog field, compared case-insensitively
+COLUMN_ALIASES = {
+    "name": ["name", "description", "food_name", "food", "product_name"],
+    "calories": ["calories", "kcal", "energy_kcal", "energy (kcal)", "energy"],
+    "protein": ["protein", "protein_g", "protein (g)"],
+    "carbs": ["carbs", "carbohydrate", "carbohydrates", "carbohydrate_g", "carbohydrate (g)"],
+    "fat": ["fat", "total_fat", "fat_g", "total lipid (fat)", "fat (g)"],
+    "category": ["category", "food_group", "food group", "group"],
+    "default_unit": ["default_unit", "unit", "serving_unit"]
+}
+NUMERIC_FIELDS = ("calories", "protein", "carbs", "fat")
+
+
+def normalize_catalog_name(name):
+    """Trimmed, single-spaced name; ALL CAPS source names are title-cased"""
+    name = re.sub(r"\s+", " ", str(name or "")).strip()
+    if name.isupper():
+        name = name.title()
+    return name
+
+def normalize_unit(unit):
+    unit = str(unit or "").strip()
+    return UNIT_ALIASES.get(unit.lower(), unit) if unit else "g"
+
+def _number(value):
+    if value in (None, ""):
+        return 0.0
+    if isinstance(value, str):
+        value = value.replace(",", "").strip()
+    return float(value)
+
+def _column_map(columns, overrides=None):
+    """{catalog field: source column} for the columns present in the file"""
+    by_lower = {column.strip().lower(): column for column in columns}
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in by_lower:
+                mapping[field] = by_lower[alias]
+                break
+    mapping.update(overrides or {})
+    if "name" not in mapping:
+        raise ValueError(f"No name column found in {sorted(columns)}; use --map name=<column>")
+    return mapping
+
+def catalog_fields(row, mapping):
+    """Catalog fields for one source row, or None when it has no usable name (ValueError on bad numbers)"""
+    name = normalize_catalog_name(row.get(mapping["name"]))
+    if not name:
+        return None
+    fields = {"name": name, "default_unit": normalize_unit(row.get(mapping.get("default_unit", "")))}
+    for field in NUMERIC_FIELDS:
+        fields[field] = _number(row.get(mapping[field])) if field in mapping else 0.0
+    if "category" in mapping:
+        fields["category"] = normalize_catalog_name(row.get(mapping["category"])) or None
+    return fields
+
+def upsert_operation(fields, overwrite=True):
+    """UpdateOne keyed on name; without overwrite, existing entries are left as they are"""
+    values = dict(fields)
+    values["name_key"] = normalize_ingredient_name(values["name"])
+    values["base_key"] = catalog_key(values["name"])
+    if overwrite:
+        update = {"$set": values, "$setOnInsert": {"popularity": 0}}
+    else:
+        update = {"$setOnInsert": {**values, "popularity": 0}}
+    return UpdateOne({"name": values["name"]}, update, upsert=True)
+
+def write_batch(operations):
+    """One unordered bulk_write; returns (inserted, updated)"""
+    if not operations:
+        return 0, 0
+    result = CommonIngredient._get_collection().bulk_write(operations, ordered=False)
+    return result.upserted_count, result.modified_count
+
+
+def iter_rows(path, fmt=None):
+    """Stream dict rows from a CSV or JSON Lines file"""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def _checkpoint_path(path):
+    return f"{path}.checkpoint"
+
+def _read_checkpoint(path):
+    """Rows already imported from path, if the checkpoint matches the file"""
+    try:
+        with open(_checkpoint_path(path), encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if checkpoint.get("size") != os.path.getsize(path):
+        return 0  # the file changed; start over
+    return checkpoint.get("rows", 0)
+
+def _write_checkpoint(path, rows):
+    tmp = _checkpoint_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"rows": rows, "size": os.path.getsize(path)}, f)
+    os.replace(tmp, _checkpoint_path(path))
+
+def import_catalog(path, fmt=None, batch_size=IMPORT_BATCH_SIZE, resume=False, overrides=None, log=print):
+    """
+    Upsert every row of path into CommonIngredient; when a name repeats, the
+    last row wins. Returns a stats dict: rows read, inserted, updated, skipped
+    (no name or bad numbers) and resumed_from.
+    """
+    start_row = _read_checkpoint(path) if resume else 0
+    stats = {"rows": 0, "inserted": 0, "updated": 0, "skipped": 0, "resumed_from": start_row}
+    if start_row:
+        log(f"Resuming after row {start_row}")
+
+    started = time.monotonic()
+    mapping = None
+    batch = {}
+    for index, row in enumerate(iter_rows(path, fmt), start=1):
+        if mapping is None:
+            mapping = _column_map(row.keys(), overrides)
+        if index <= start_row:
+            continue
+        stats["rows"] += 1
+        try:
+            fields = catalog_fields(row, mapping)
+        except (TypeError, ValueError):
+            fields = None
+        if fields is None:
+            stats["skipped"] += 1
+        else:
+            batch[fields["name"]] = upsert_operation(fields)
+
+        if len(batch) >= batch_size:
+            inserted, updated = write_batch(list(batch.values()))
+            stats["inserted"] += inserted
+            stats["updated"] += updated
+            batch = {}
+            _write_checkpoint(path, index)
+        if index % PROGRESS_EVERY == 0:
+            rate = stats["rows"] / max(time.monotonic() - started, 1e-9)
+            log(f"{index} rows, {stats['inserted']} new, {stats['updated']} updated ({rate:.0f} rows/s)")
+
+    inserted, updated = write_batch(list(batch.values()))
+    stats["inserted"] += inserted
+    stats["updated"] += updated
+    if mapping is not None:
+        _write_checkpoint(path, start_row + stats["rows"])
+    if stats["inserted"] or stats["updated"]:
+        bump_catalog_version()
+    return stats
@@ -0,0 +1,47 @@
+# identity.py
+# The current user for a request, without a User query.
+# Most routes only need the user as a filter (Ingredient.objects(user=user)), so
+# current_user_ref() builds a reference straight from the ObjectId in the JWT.
+# Routes that need the user document itself call current_user(), which loads
+# it once per request.
+
+import os
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import g, abort, jsonify, make_response
+from flask_jwt_extended import get_jwt_identity
+from mongoengine.base import LazyReference
+
+from models import User
+from cache import LRUCache
+
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", 4096))
+IDENTITY_CACHE_TTL = float(os.getenv("IDENTITY_CACHE_TTL", 300))  # seconds
+
+_refs = LRUCache(IDENTITY_CACHE_SIZE, ttl=IDENTITY_CACHE_TTL)
+
+
+def current_user_ref():
+    """
+    Reference to the user in the request's JWT (has .pk and .fetch()).
+    Cached on g for the request and per worker for IDENTITY_CACHE_TTL.
+    """
+    ref = g.get("user_ref")
+    if ref is None:
+        identity = get_jwt_identity()
+        ref = _refs.get(identity)
+        if ref is None:
+            try:
+                ref = LazyReference(User, ObjectId(identity))
+            except (InvalidId, TypeError):
+                abort(make_response(jsonify({"error": "Invalid token identity"}), 401))
+            _refs.set(identity, ref)
+        g.user_ref = ref
+    return ref
+
+def current_user():
+    """The user document for the request's JWT (None if it no longer exists), loaded once per request"""
+    if "user" not in g:
+        g.user = User.objects(id=current_user_ref().pk).first()
+    return g.user
@@ -0,0 +1,152 @@
+# indexes.py
+# Index management: build (or just verify) every declared index at startup, and
+# explain() the hot route queries to prove none of them scans a whole collection.
+#
+#   flask --app app check-indexes     # exits non-zero on a COLLSCAN
+
+import os
+import logging
+import datetime
+
+from bson import ObjectId
+
+from models import (
+    User,
+    CommonIngredient,
+    UserDefinedIngredient,
+    Ingredient,
+    UserPreference,
+    DailyCalorieLog,
+    DailyCalorieRollup,
+    SavedRecipe,
+    RecipeCacheEntry,
+    NutritionCacheEntry,
+    RecipeJob,
+    UserDataVersion,
+    PrecomputedRecipes,
+    CatalogVersion
+)
+
+INDEXED_MODELS = [
+    User,
+    CommonIngredient,
+    UserDefinedIngredient,
+    Ingredient,
+    UserPreference,
+    DailyCalorieLog,
+    DailyCalorieRollup,
+    SavedRecipe,
+    RecipeCacheEntry,
+    NutritionCacheEntry,
+    RecipeJob,
+    UserDataVersion,
+    PrecomputedRecipes,
+    CatalogVersion
+]
+
+logger = logging.getLogger(__name__)
+
+# "build" creates missing indexes at startup, "verify" only reports them
+# (for deployments where index builds are run separately), "off" skips the check
+MONGO_INDEX_MODE = os.getenv("MONGO_INDEX_MODE", "build")
+
+
+def _declared_keys(model):
+    """Key patterns declared on model, as tuples of (field, direction)"""
+    keys = [tuple(spec["fields"]) for spec in model._meta.get("index_specs") or []]
+    return [tuple((field, direction) for field, direction in key) for key in keys]
+
+def missing_indexes(model):
+    """Declared key patterns that do not exist on the collection yet"""
+    existing = {
+        tuple(index["key"].items())
+        for index in model._get_db()[model._get_collection_name()].list_indexes()
+    }
+    return [key for key in _declared_keys(model) if key not in existing]
+
+def ensure_indexes(mode=None):
+    """
+    Build or verify the declared indexes of every model.
+    Returns {collection name: [missing key patterns]} for whatever is still missing.
+    """
+    mode = mode or MONGO_INDEX_MODE
+    if mode == "off":
+        return {}
+
+    missing = {}
+    for model in INDEXED_MODELS:
+        if mode == "build":
+            model.ensure_indexes()
+        else:
+            # Stop MongoEngine from building them lazily on first use
+            model._meta["auto_create_index"] = False
+        keys = missing_indexes(model)
+        if keys:
+            missing[model._get_collection_name()] = keys
+    for collection, keys in missing.items():
+        logger.warning(f"Missing indexes on {collection}: {keys}")
+    return missing
+
+
+# -------------------------
+# Query plan checks
+# -------------------------
+
+def _route_queries():
+    """The queries behind the hot routes, built for a placeholder user"""
+    user = ObjectId()
+    today = datetime.date.today()
+    return {
+        "login: user by username": User.objects(username="placeholder"),
+        "list fridge": Ingredient.objects(user=user),
+        "update/delete ingredient": Ingredient.objects(id=ObjectId(), user=user),
+        "custom ingredient by name": UserDefinedIngredient.objects(user=user, name__iexact="egg"),
+        "seed: common ingredient by name": CommonIngredient.objects(name="Egg"),
+        "catalog snapshot load": CommonIngredient.objects().order_by('-popularity').limit(20001),
+        "catalog lookup outside snapshot": CommonIngredient.objects(name_key__in=["egg"]),
+        "catalog prefix search outside snapshot": CommonIngredient.objects(name_key__startswith="egg").limit(20),
+        "ingredient search (custom)": UserDefinedIngredient.objects(user=user, name__icontains="egg").limit(5),
+        "preferences": UserPreference.objects(user=user),
+        "calorie summary": DailyCalorieRollup.objects(
+            user=user,
+            date__gte=today - datetime.timedelta(days=6),
+            date__lte=today
+        ).order_by('date'),
+        "calorie entries page": DailyCalorieLog.objects(
+            user=user,
+            date__gte=today - datetime.timedelta(days=6),
+            date__lte=today
+        ).order_by('date', 'id').limit(51),
+        "saved recipes": SavedRecipe.objects(user=user).order_by('-saved_at', '-id').limit(51),
+        "saved recipe duplicate check": SavedRecipe.objects(user=user, name="placeholder"),
+        "recipe cache lookup": RecipeCacheEntry.objects(key="placeholder", expires_at__gt=datetime.datetime.utcnow()),
+        "nutrition cache lookup": NutritionCacheEntry.objects(name_key="egg"),
+        "recipe job dedupe": RecipeJob.objects(user=user, request_key="placeholder"),
+        "data versions": UserDataVersion.objects(user=user),
+        "precomputed recipes": PrecomputedRecipes.objects(user=user, meal_type="Dinner"),
+        "catalog version poll": CatalogVersion.objects(name="common_ingredients")
+    }
+
+def _stages(plan):
+    """Every stage name in an explain() plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+def check_query_plans():
+    """
+    explain() each route query and return {query name: winning plan stages}
+    for those whose winning plan contains a COLLSCAN.
+    """
+    failures = {}
+    for name, queryset in _route_queries().items():
+        plan = queryset.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = list(_stages(plan))
+        if "COLLSCAN" in stages:
+            failures[name] = stages
+    return failures
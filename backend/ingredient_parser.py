@@ -0,0 +1,242 @@
+# ingredient_parser.py
+# Deterministic parser for ingredient lists like "2 eggs, 500g chicken breast and milk".
+# Fragments that resolve against the ingredient catalog are answered locally with
+# catalog nutrition; only the leftovers are sent to the LLM.
+
+import re
+import datetime
+
+from models import UserDefinedIngredient
+from llm_service import parse_ingredients_from_text
+from cache import normalize_ingredient_name
+from catalog import get_catalog, catalog_key
+
+UNIT_ALIASES = {
+    "pcs": "pcs", "pc": "pcs", "piece": "pcs", "pieces": "pcs",
+    "g": "g", "gr": "g", "gram": "g", "grams": "g", "gramme": "g", "grammes": "g",
+    "kg": "kg", "kgs": "kg", "kilo": "kg", "kilos": "kg", "kilogram": "kg", "kilograms": "kg",
+    "ml": "ml", "milliliter": "ml", "milliliters": "ml", "millilitre": "ml", "millilitres": "ml",
+    "l": "L", "liter": "L", "liters": "L", "litre": "L", "litres": "L",
+    "cup": "cup", "cups": "cup",
+    "tbsp": "tbsp", "tablespoon": "tbsp", "tablespoons": "tbsp",
+    "tsp": "tsp", "teaspoon": "tsp", "teaspoons": "tsp",
+    "oz": "oz", "ounce": "oz", "ounces": "oz",
+    "lb": "lb", "lbs": "lb", "pound": "lb", "pounds": "lb"
+}
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "half": 0.5, "dozen": 12, "a dozen": 12, "half a dozen": 6
+}
+
+# Typical fridge life by catalog category, used for the suggested expiry date
+SHELF_LIFE_DAYS = {
+    "fruit": 7,
+    "vegetable": 7,
+    "meat": 3,
+    "seafood": 2,
+    "dairy": 7,
+    "grain": 180,
+    "nut": 180
+}
+SHELF_LIFE_OVERRIDES = {"egg": 28}
+
+_LEADING_FILLER = re.compile(
+    r"^(?:(?:i|we)\s+(?:just\s+)?(?:bought|got|have|picked up|added)|there\s+(?:is|are)|and|add|also|plus|some)\s+",
+    re.IGNORECASE
+)
+_LIST_SEPARATORS = re.compile(r"\s*[,;\n]\s*")
+_AND = re.compile(r"\s+(?:and|&|plus)\s+", re.IGNORECASE)
+
+_NUMBER = r"\d+(?:\.\d+)?(?:\s+\d+/\d+)?|\d+/\d+"
+_NUMBER_WORD = "|".join(sorted(NUMBER_WORDS, key=len, reverse=True))
+_FRAGMENT = re.compile(
+    rf"^(?:(?P<qty>{_NUMBER}|(?:{_NUMBER_WORD})\b)\s*)?"
+    r"(?:(?P<unit>[a-zA-Z]+)\b\.?\s*(?=\S))?"  # never the last word, which is the name
+    r"(?:of\s+)?(?P<name>.+?)\.?$",
+    re.IGNORECASE
+)
+
+
+def _parse_quantity(text):
+    text = text.lower()
+    if text in NUMBER_WORDS:
+        return NUMBER_WORDS[text]
+    total = 0.0
+    for part in text.split():
+        if "/" in part:
+            numerator, denominator = part.split("/")
+            if float(denominator) == 0:
+                return None
+            total += float(numerator) / float(denominator)
+        else:
+            total += float(part)
+    return total
+
+def _format_quantity(value):
+    return str(int(value)) if float(value).is_integer() else f"{value:g}"
+
+def _singular_forms(name):
+    """The name plus plausible singulars ("tomatoes" -> "tomato", "berries" -> "berry")"""
+    forms = [name]
+    if name.endswith("ies") and len(name) > 4:
+        forms.append(name[:-3] + "y")
+    if name.endswith("ves") and len(name) > 4:
+        forms.append(name[:-3] + "f")
+    if name.endswith("oes") or re.search(r"(?:s|x|z|ch|sh)es$", name):
+        forms.append(name[:-2])
+    if name.endswith("s") and not name.endswith("ss"):
+        forms.append(name[:-1])
+    return forms
+
+def parse_fragment(fragment):
+    """
+    Split one list item into (quantity, unit, name), or None if it does not look
+    like "<qty> <unit> <name>". quantity and unit may be None.
+
+    >>> parse_fragment("3 apples.")
+    (3.0, None, 'apples')
+    >>> parse_fragment("500g of chicken breast!")
+    (500.0, 'g', 'chicken breast')
+    """
+    fragment = _LEADING_FILLER.sub("", fragment.strip()).strip().rstrip(".!?").strip()
+    match = _FRAGMENT.match(fragment)
+    if not match:
+        return None
+
+    qty, unit, name = match.group("qty"), match.group("unit"), match.group("name")
+    if unit and unit.lower() not in UNIT_ALIASES:
+        # Not a unit, just the first word of the name
+        name = f"{unit} {name}"
+        unit = None
+    if not name or not re.search(r"[a-zA-Z]", name):
+        return None
+
+    quantity = _parse_quantity(qty) if qty else None
+    if qty and quantity is None:
+        return None
+    return quantity, UNIT_ALIASES[unit.lower()] if unit else None, normalize_ingredient_name(name)
+
+
+# -------------------------
+# Catalog resolution
+# -------------------------
+
+def lookup_catalog(user, names):
+    """
+    Resolve normalized names against the common ingredient snapshot, then the
+    user's custom ingredients (one $in query for whatever is left). A bare name
+    also matches a qualified entry ("milk" -> "Milk (Whole)"); common ingredients win.
+    """
+    known = get_catalog().resolve_many(list(names))
+
+    remaining = [name for name in names if name not in known]
+    if not remaining:
+        return known
+    patterns = [re.compile(rf"^{re.escape(name)}(?:\s*\(.*\))?$", re.IGNORECASE) for name in remaining]
+    custom = {}
+    for item in UserDefinedIngredient.objects(user=user, name__in=patterns):
+        custom.setdefault(catalog_key(item.name), item)
+        custom[normalize_ingredient_name(item.name)] = item
+    for name in remaining:
+        if name in custom:
+            known[name] = custom[name]
+    return known
+
+def _shelf_life(name_key, source):
+    if name_key in SHELF_LIFE_OVERRIDES:
+        return SHELF_LIFE_OVERRIDES[name_key]
+    category = (getattr(source, "category", None) or "").lower()
+    return SHELF_LIFE_DAYS.get(category)
+
+def _from_catalog(parsed, source):
+    quantity, unit, _ = parsed
+    result = {
+        "name": source.name,
+        "quantity": _format_quantity(quantity) if quantity is not None else "",
+        # A bare count ("2 eggs") is pieces; a bare name gets the catalog's usual unit
+        "unit": unit or ("pcs" if quantity is not None else source.default_unit),
+        "calories": float(source.calories or 0),
+        "protein": float(source.protein or 0),
+        "carbs": float(source.carbs or 0),
+        "fat": float(source.fat or 0)
+    }
+    days = _shelf_life(catalog_key(source.name), source)
+    if days is not None:
+        result["expiryDate"] = (datetime.date.today() + datetime.timedelta(days=days)).isoformat()
+    return result
+
+def split_fragments(text):
+    """
+    Split text into list items. Each item is returned as its "and"-separated parts;
+    whether those are separate ingredients ("eggs and milk") or one ("mac and cheese")
+    is decided by parse_ingredients() once it knows which parts resolve.
+    """
+    items = []
+    for chunk in _LIST_SEPARATORS.split(text or ""):
+        chunk = _LEADING_FILLER.sub("", chunk.strip()).strip()
+        if chunk:
+            items.append([part for part in _AND.split(chunk) if part.strip()])
+    return items
+
+def _resolve(fragment, known):
+    parsed = parse_fragment(fragment)
+    if not parsed:
+        return None
+    source = next((known[form] for form in _singular_forms(parsed[2]) if form in known), None)
+    return _from_catalog(parsed, source) if source else None
+
+def resolve_item(parts, known):
+    """
+    (resolved ingredients, text for the LLM or None) for one list item given as
+    its "and"-separated parts. The whole phrase is tried first ("mac and cheese"),
+    then each part; only the parts that do not resolve are left for the LLM, or
+    the whole phrase when none do.
+
+    >>> from types import SimpleNamespace
+    >>> egg = SimpleNamespace(name="Egg", default_unit="pcs", calories=155, protein=13, carbs=1, fat=11, category="dairy")
+    >>> resolved, leftover = resolve_item(["2 eggs", "kale"], {"egg": egg})
+    >>> [(r["name"], r["quantity"]) for r in resolved], leftover
+    ([('Egg', '2')], 'kale')
+    >>> resolve_item(["salt", "pepper"], {"egg": egg})
+    ([], 'salt and pepper')
+    """
+    whole = " and ".join(parts)
+    resolved = _resolve(whole, known)
+    if resolved:
+        return [resolved], None
+    if len(parts) == 1:
+        return [], whole
+    resolved = [_resolve(part, known) for part in parts]
+    if not any(resolved):
+        return [], whole
+    leftover = [part for part, result in zip(parts, resolved) if not result]
+    return [result for result in resolved if result], ", ".join(leftover) or None
+
+def parse_ingredients(user, text):
+    """
+    parse_ingredients_from_text() with a local fast path: items that resolve
+    against the catalog are answered without the LLM, the rest go to it in one call.
+    Returns the same list shape as parse_ingredients_from_text().
+    """
+    items = split_fragments(text)
+    fragments = [part for parts in items for part in parts] + [" and ".join(parts) for parts in items]
+    candidates = set()
+    for fragment in fragments:
+        parsed = parse_fragment(fragment)
+        if parsed:
+            candidates.update(_singular_forms(parsed[2]))
+    known = lookup_catalog(user, candidates)
+
+    results = []
+    unresolved = []
+    for parts in items:
+        resolved, leftover = resolve_item(parts, known)
+        results.extend(resolved)
+        if leftover:
+            unresolved.append(leftover)
+
+    if unresolved:
+        results.extend(parse_ingredients_from_text(", ".join(unresolved)))
+    return results
@@ -0,0 +1,168 @@
+# jobs.py
+# Background recipe generation.
+# Jobs run on a bounded local thread pool, so the pool size is a hard cap on
+# in-flight Groq calls from this worker. Job state lives in MongoDB so any
+# worker can answer a poll. The owning worker refreshes heartbeat_at on its
+# unfinished jobs; a queued or running job whose heartbeat stopped (its process
+# died) is marked failed instead of being handed out or polled forever.
+
+import os
+import time
+import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from bson import ObjectId
+
+from models import RecipeJob
+from llm_client import LLMError
+from cache import cached_generate_recipes, recipe_cache_key
+import metrics
+
+RECIPE_JOB_WORKERS = int(os.getenv("RECIPE_JOB_WORKERS", 4))
+RECIPE_JOB_MAX_PENDING = int(os.getenv("RECIPE_JOB_MAX_PENDING", 100))
+RECIPE_JOB_TTL = int(os.getenv("RECIPE_JOB_TTL", 15 * 60))  # seconds a job stays pollable
+RECIPE_JOB_HEARTBEAT = float(os.getenv("RECIPE_JOB_HEARTBEAT", 10))  # seconds between heartbeats
+RECIPE_JOB_STALE_AFTER = float(os.getenv("RECIPE_JOB_STALE_AFTER", 60))  # seconds without one = lost
+JOB_POLL_INTERVAL = 0.5
+LOST_JOB_ERROR = {"error": "job_lost", "message": "The worker running this job stopped. Please submit it again."}
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Too many jobs are already waiting on this worker"""
+
+
+_executor = ThreadPoolExecutor(max_workers=RECIPE_JOB_WORKERS, thread_name_prefix="recipe-job")
+_lock = threading.Lock()
+_pending = 0
+_local_done = {}  # job id -> Event for jobs running in this process
+_heartbeat_thread = None
+
+def _heartbeat():
+    while True:
+        time.sleep(RECIPE_JOB_HEARTBEAT)
+        with _lock:
+            ids = list(_local_done)
+        if not ids:
+            continue
+        try:
+            RecipeJob.objects(id__in=ids, status__in=["queued", "running"]).update(
+                set__heartbeat_at=datetime.datetime.utcnow()
+            )
+        except Exception as e:
+            logger.warning(f"Recipe job heartbeat failed: {e}")
+
+def _fail_if_stale(job, now):
+    """Mark an unfinished job failed if its worker stopped heartbeating; True if it did"""
+    if job.status not in ("queued", "running"):
+        return False
+    cutoff = now - datetime.timedelta(seconds=RECIPE_JOB_STALE_AFTER)
+    if job.heartbeat_at is not None and job.heartbeat_at > cutoff:
+        return False
+    # Conditional on the stale heartbeat, so a job that just recovered or finished is left alone
+    failed = RecipeJob.objects(
+        id=job.id,
+        status__in=["queued", "running"],
+        heartbeat_at__not__gt=cutoff
+    ).update_one(set__status="failed", set__error=LOST_JOB_ERROR, set__finished_at=now)
+    if failed:
+        logger.warning(f"Recipe job {job.id} lost its worker; marked failed")
+    return bool(failed)
+
+def submit_recipe_job(user, ingredients, preferences, meal_type, count):
+    """
+    Queue a recipe generation for user and return its RecipeJob.
+    An identical request that recently finished, or is queued or running on a
+    live worker, is returned instead of starting a new job.
+    """
+    global _pending, _heartbeat_thread
+    key = recipe_cache_key(ingredients, preferences, meal_type, count)
+    now = datetime.datetime.utcnow()
+
+    with _lock:
+        existing = RecipeJob.objects(
+            user=user,
+            request_key=key,
+            status__ne="failed",
+            expires_at__gt=now
+        ).order_by('-created_at').first()
+        if existing and not _fail_if_stale(existing, now):
+            return existing
+
+        if _pending >= RECIPE_JOB_MAX_PENDING:
+            raise JobQueueFull("Too many recipe jobs in progress. Please try again shortly.")
+
+        job = RecipeJob(
+            user=user,
+            request_key=key,
+            meal_type=meal_type,
+            heartbeat_at=now,
+            expires_at=now + datetime.timedelta(seconds=RECIPE_JOB_TTL)
+        )
+        job.save()
+        _pending += 1
+        _local_done[str(job.id)] = threading.Event()
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat, name="recipe-job-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+
+    _executor.submit(_run_recipe_job, job.id, ingredients, preferences, meal_type, count)
+    return job
+
+def _run_recipe_job(job_id, ingredients, preferences, meal_type, count):
+    global _pending
+    metrics.set_endpoint("recipe_job")
+    RecipeJob.objects(id=job_id).update_one(set__status="running", set__heartbeat_at=datetime.datetime.utcnow())
+    try:
+        recipes, cached = cached_generate_recipes(ingredients, preferences, meal_type, count)
+        RecipeJob.objects(id=job_id).update_one(
+            set__status="done",
+            set__result={"recipes": recipes, "count": len(recipes), "cached": cached},
+            set__finished_at=datetime.datetime.utcnow()
+        )
+    except LLMError as e:
+        _fail_job(job_id, {"error": e.error_code, "message": str(e)})
+    except Exception as e:
+        _fail_job(job_id, {"error": f"Failed to generate recipes: {str(e)}"})
+    finally:
+        with _lock:
+            _pending -= 1
+            done = _local_done.pop(str(job_id), None)
+        if done:
+            done.set()
+
+def _fail_job(job_id, error):
+    RecipeJob.objects(id=job_id).update_one(
+        set__status="failed",
+        set__error=error,
+        set__finished_at=datetime.datetime.utcnow()
+    )
+
+def get_recipe_job(job_id, user, wait=0):
+    """
+    Fetch a job owned by user, optionally long-polling up to wait seconds for it to finish.
+    Returns None if the job does not exist (or belongs to someone else).
+    """
+    if not ObjectId.is_valid(job_id):
+        return None
+    job = RecipeJob.objects(id=job_id, user=user).first()
+    if job and str(job.id) not in _local_done and _fail_if_stale(job, datetime.datetime.utcnow()):
+        job.reload()
+    if not job or wait <= 0 or job.status in ("done", "failed"):
+        return job
+
+    deadline = time.monotonic() + wait
+    done = _local_done.get(str(job.id))
+    if done:
+        done.wait(wait)
+    else:
+        # Job runs on another worker: poll its document
+        while time.monotonic() < deadline:
+            time.sleep(JOB_POLL_INTERVAL)
+            if RecipeJob.objects(id=job.id, status__in=["done", "failed"]).count():
+                break
+    job.reload()
+    return job
@@ -0,0 +1,406 @@
+# llm_client.py
+# Transport layer for Groq calls.
+# A single AsyncGroq client runs on a background event loop shared by all request
+# threads, so connections are pooled and bounded, every call has a deadline, and
+# throttled calls are retried with backoff instead of tying up workers.
+
+import os
+import time
+import queue
+import random
+import asyncio
+import threading
+import contextvars
+import concurrent.futures
+
+import httpx
+from groq import AsyncGroq, RateLimitError, APIStatusError, APITimeoutError, APIConnectionError
+
+import metrics
+from llm_routing import get_route
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", LLM_MAX_CONNECTIONS))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))  # HTTP read timeout; call deadlines come from llm_routing
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 8))
+
+
+# -------------------------
+# Errors
+# -------------------------
+
+class LLMError(Exception):
+    """Base class for LLM failures; carries the HTTP status and error code to report"""
+    status_code = 502
+    error_code = "llm_error"
+
+
+class LLMConfigError(LLMError):
+    """GROQ_API_KEY is not configured"""
+    status_code = 503
+    error_code = "missing_api_key"
+
+
+class LLMRateLimitError(LLMError):
+    """Upstream kept answering 429 after retries"""
+    status_code = 429
+    error_code = "rate_limit"
+
+    def __init__(self, message="API rate limit reached. Please try again later.", retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMTimeoutError(LLMError):
+    """The call did not finish within its deadline"""
+    status_code = 504
+    error_code = "timeout"
+
+
+class LLMUnavailableError(LLMError):
+    """Connection failure or 5xx from upstream"""
+    status_code = 503
+    error_code = "upstream_unavailable"
+
+
+def _retry_after(response):
+    """Seconds to wait according to the retry-after header, if present"""
+    if response is None:
+        return None
+    try:
+        return max(float(response.headers.get("retry-after")), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+# Task of the call being made, for transports that record it (see llm_replay)
+current_task = contextvars.ContextVar("llm_task", default=None)
+
+# Errors on which a call moves on to the next model tier
+_FALLBACK_ERRORS = (LLMTimeoutError, LLMRateLimitError, LLMUnavailableError)
+
+
+# -------------------------
+# Transport
+# -------------------------
+
+class GroqTransport:
+    """Talks to the Groq API through a pooled AsyncGroq client"""
+
+    def __init__(self, api_key):
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+        )
+        # Retries are handled by _with_retry so they respect the caller's deadline
+        self._client = AsyncGroq(api_key=api_key, http_client=http_client, max_retries=0)
+
+    async def create(self, timeout, **params):
+        """Return a chat completion, or an async iterator of chunks when stream=True"""
+        try:
+            return await self._client.chat.completions.create(timeout=timeout, **params)
+        except RateLimitError as e:
+            raise LLMRateLimitError(retry_after=_retry_after(e.response)) from e
+        except APITimeoutError as e:
+            raise LLMTimeoutError("LLM request timed out") from e
+        except APIConnectionError as e:
+            raise LLMUnavailableError(f"Could not reach LLM API: {e}") from e
+        except APIStatusError as e:
+            if e.status_code >= 500:
+                raise LLMUnavailableError(f"LLM API error {e.status_code}") from e
+            raise LLMError(f"LLM API error {e.status_code}: {e.message}") from e
+
+
+_transport = None
+_loop = None
+_loop_lock = threading.Lock()
+_slots = None
+_in_flight = 0
+
+def set_transport(transport):
+    """
+    Replace the transport used for all calls (None restores the default).
+    A transport is any object with an async create(timeout, **params) method.
+    """
+    global _transport
+    _transport = transport
+
+def _default_transport():
+    """
+    Groq, unless LLM_TRANSPORT=replay selects the offline stand-in.
+    LLM_RECORD_FILE additionally records every Groq exchange for later replay.
+    """
+    if os.getenv("LLM_TRANSPORT", "groq") == "replay":
+        from llm_replay import ReplayTransport
+        return ReplayTransport.from_env()
+
+    api_key = os.getenv("GROQ_API_KEY", "")
+    if not api_key:
+        raise LLMConfigError("GROQ_API_KEY is not set.")
+    transport = GroqTransport(api_key)
+    if os.getenv("LLM_RECORD_FILE"):
+        from llm_replay import RecordingTransport
+        transport = RecordingTransport(transport, os.environ["LLM_RECORD_FILE"])
+    return transport
+
+def _get_transport():
+    global _transport
+    if _transport is None:
+        _transport = _default_transport()
+    return _transport
+
+def _get_loop():
+    """Background event loop that owns the async client (started lazily, after any fork)"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-client-loop", daemon=True).start()
+    return _loop
+
+def in_flight():
+    """Number of LLM calls currently holding a connection slot"""
+    return _in_flight
+
+metrics.Gauge("llm_in_flight", "LLM calls currently holding a connection slot", in_flight)
+
+def _outcome(error):
+    return error.error_code if isinstance(error, LLMError) else "error"
+
+def _record_usage(labels, usage):
+    if usage is None:
+        return
+    metrics.LLM_TOKENS.inc(*labels, "prompt", amount=getattr(usage, "prompt_tokens", 0) or 0)
+    metrics.LLM_TOKENS.inc(*labels, "completion", amount=getattr(usage, "completion_tokens", 0) or 0)
+
+def _record_call(labels, started, outcome):
+    metrics.LLM_REQUESTS.inc(*labels, outcome)
+    metrics.LLM_DURATION.observe(time.monotonic() - started, *labels, outcome)
+
+def _backoff(attempt, error):
+    if isinstance(error, LLMRateLimitError) and error.retry_after is not None:
+        return error.retry_after
+    delay = min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** (attempt - 1)))
+    return delay * random.uniform(0.5, 1.0)
+
+async def _with_retry(call, deadline, labels, retries=LLM_MAX_RETRIES):
+    """
+    Run call(remaining_seconds) under the in-flight cap until it succeeds, the
+    deadline passes, or retries run out. Only 429s and upstream outages are retried.
+    """
+    global _slots, _in_flight
+    if _slots is None:
+        _slots = asyncio.Semaphore(LLM_MAX_IN_FLIGHT)
+
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMTimeoutError("LLM call exceeded its deadline")
+        try:
+            async with _slots:
+                _in_flight += 1
+                try:
+                    remaining = deadline - time.monotonic()
+                    result = await asyncio.wait_for(call(remaining), max(remaining, 0))
+                    metrics.LLM_ATTEMPTS.inc(*labels, "ok")
+                    return result
+                except Exception as e:
+                    metrics.LLM_ATTEMPTS.inc(*labels, "timeout" if isinstance(e, asyncio.TimeoutError) else _outcome(e))
+                    raise
+                finally:
+                    _in_flight -= 1
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError("LLM call exceeded its deadline")
+        except (LLMRateLimitError, LLMUnavailableError) as e:
+            attempt += 1
+            delay = _backoff(attempt, e)
+            if attempt > retries or time.monotonic() + delay >= deadline:
+                raise
+            await asyncio.sleep(delay)
+
+def _tier_deadline(route, index, models, deadline):
+    """
+    Deadline for the index-th model tier. Every tier but the last may only use
+    primary_share of the remaining time, leaving the rest to the faster tiers.
+    """
+    if index == len(models) - 1:
+        return deadline
+    now = time.monotonic()
+    return now + (deadline - now) * route.primary_share
+
+def _models_for(route, params):
+    """An explicit model= pins the call to that model, otherwise the route's tiers apply"""
+    model = params.pop("model", None)
+    return [model] if model else route.models
+
+async def _acomplete(deadline, labels, retries, **params):
+    """One model tier of a call, recorded under labels (endpoint, task, model)"""
+    started = time.monotonic()
+    current_task.set(labels[1])
+    try:
+        transport = _get_transport()
+        completion = await _with_retry(
+            lambda remaining: transport.create(remaining, **params), deadline, labels, retries
+        )
+    except Exception as e:
+        _record_call(labels, started, _outcome(e))
+        raise
+    _record_call(labels, started, "ok")
+    _record_usage(labels, getattr(completion, "usage", None))
+    return completion
+
+async def achat_completion(deadline, task, endpoint, **params):
+    """
+    Coroutine form of chat_completion(); deadline is a time.monotonic() value and
+    endpoint the metrics label captured on the calling thread.
+    """
+    route = get_route(task)
+    models = _models_for(route, params)
+    for index, model in enumerate(models):
+        last = index == len(models) - 1
+        try:
+            return await _acomplete(
+                _tier_deadline(route, index, models, deadline),
+                (endpoint, task, model),
+                LLM_MAX_RETRIES if last else 0,
+                model=model,
+                **params
+            )
+        except _FALLBACK_ERRORS as e:
+            if last:
+                raise
+            metrics.LLM_FALLBACKS.inc(endpoint, task, model, models[index + 1], e.error_code)
+
+def chat_completion(timeout=None, task="other", **params):
+    """
+    Blocking chat completion through the shared client.
+    params are passed to chat.completions.create (messages, temperature, ...).
+    The model and default timeout come from the task's route in llm_routing
+    unless params pins a model. Raises an LLMError subclass on failure.
+    """
+    timeout = timeout or get_route(task).budget
+    deadline = time.monotonic() + timeout
+    future = asyncio.run_coroutine_threadsafe(
+        achat_completion(deadline, task, metrics.current_endpoint(), **params), _get_loop()
+    )
+    try:
+        return future.result(timeout=timeout + 1)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise LLMTimeoutError("LLM call exceeded its deadline")
+
+def chat_completion_fanout(requests, timeout=None, task="other"):
+    """
+    Run several chat completions concurrently under one shared deadline.
+    requests is a list of params dicts; returns one entry per request, either the
+    completion or the exception it failed with (LLMTimeoutError if it ran out of time).
+    """
+    timeout = timeout or get_route(task).budget
+    deadline = time.monotonic() + timeout
+    endpoint = metrics.current_endpoint()
+
+    async def run_all():
+        return await asyncio.gather(
+            *(achat_completion(deadline, task, endpoint, **params) for params in requests),
+            return_exceptions=True
+        )
+
+    future = asyncio.run_coroutine_threadsafe(run_all(), _get_loop())
+    try:
+        return future.result(timeout=timeout + 1)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        return [LLMTimeoutError("LLM call exceeded its deadline") for _ in requests]
+
+_STREAM_END = object()
+
+def stream_chat_completion(timeout=None, task="other", **params):
+    """
+    Blocking iterator over the text deltas of a streamed completion.
+    Retries and tier fallback apply only to failures opening the stream (a tier
+    must open it within its share of the budget); the deadline covers the whole stream.
+    Stopping iteration early cancels the upstream request.
+    """
+    route = get_route(task)
+    models = _models_for(route, params)
+    timeout = timeout or route.budget
+    started = time.monotonic()
+    deadline = started + timeout
+    endpoint = metrics.current_endpoint()
+    transport = _get_transport()
+    deltas = queue.Queue()
+    sent = False
+
+    async def consume(remaining, labels, open_by):
+        # Runs inside the in-flight slot so open streams count against the cap
+        nonlocal sent
+        current_task.set(task)
+        try:
+            stream = await asyncio.wait_for(
+                transport.create(remaining, stream=True, model=labels[2], **params),
+                max(open_by - time.monotonic(), 0)
+            )
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError("LLM stream did not start within its budget")
+        first = True
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first:
+                    metrics.LLM_TTFT.observe(time.monotonic() - started, *labels)
+                    first = False
+                sent = True
+                deltas.put(chunk.choices[0].delta.content)
+            # Groq reports usage on the final chunk
+            x_groq = getattr(chunk, "x_groq", None)
+            _record_usage(labels, getattr(x_groq, "usage", None))
+
+    async def pump():
+        try:
+            for index, model in enumerate(models):
+                last = index == len(models) - 1
+                labels = (endpoint, task, model)
+                tier_started = time.monotonic()
+                open_by = _tier_deadline(route, index, models, deadline)
+                try:
+                    await _with_retry(
+                        lambda remaining: consume(remaining, labels, open_by),
+                        deadline, labels, LLM_MAX_RETRIES if last else 0
+                    )
+                    _record_call(labels, tier_started, "ok")
+                    return
+                except asyncio.CancelledError:
+                    # The reader stopped early (client disconnected)
+                    _record_call(labels, tier_started, "cancelled")
+                    raise
+                except Exception as e:
+                    _record_call(labels, tier_started, _outcome(e))
+                    # Only fall back while nothing has been sent to the reader
+                    if last or not isinstance(e, _FALLBACK_ERRORS) or sent:
+                        deltas.put(e)
+                        return
+                    metrics.LLM_FALLBACKS.inc(endpoint, task, model, models[index + 1], e.error_code)
+        finally:
+            deltas.put(_STREAM_END)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), _get_loop())
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                item = deltas.get(timeout=max(remaining, 0))
+            except queue.Empty:
+                raise LLMTimeoutError("LLM stream exceeded its deadline")
+            if item is _STREAM_END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        future.cancel()
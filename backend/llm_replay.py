@@ -0,0 +1,211 @@
+# llm_replay.py
+# Record/replay transports for llm_client, for load and regression testing
+# without spending Groq quota or needing network access.
+#
+#   LLM_RECORD_FILE=llm.jsonl python app.py     # record real traffic
+#   LLM_TRANSPORT=replay LLM_REPLAY_FILE=llm.jsonl LLM_REPLAY_LATENCY=lognormal:0.0,0.5 \
+#   LLM_REPLAY_RATE_LIMIT=0.05 LLM_REPLAY_MALFORMED=0.1 python app.py
+
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+import itertools
+from types import SimpleNamespace
+
+from llm_client import LLMRateLimitError, LLMTimeoutError, current_task
+
+
+def _hash(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()
+
+def _prompt_key(params):
+    """Exact match key: same messages to the same model"""
+    return _hash({"model": params.get("model"), "messages": params.get("messages")})
+
+def _task_key(params):
+    """Loose match key: the system prompt identifies which LLM function made the call"""
+    system = [m["content"] for m in params.get("messages", []) if m.get("role") == "system"]
+    return _hash(system)
+
+def _completion(content, model, usage):
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=content), finish_reason="stop")],
+        usage=SimpleNamespace(**usage) if usage else None
+    )
+
+def _chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=None)])
+
+
+class RecordingTransport:
+    """Passes calls through to another transport and appends each exchange to a JSONL file"""
+
+    def __init__(self, inner, path):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _write(self, params, content, usage, latency):
+        record = {
+            "prompt_key": _prompt_key(params),
+            "task_key": _task_key(params),
+            "task": current_task.get(),
+            "model": params.get("model"),
+            "messages": params.get("messages"),
+            "options": {key: params[key] for key in ("temperature", "max_tokens") if key in params},
+            "stream": bool(params.get("stream")),
+            "content": content,
+            "usage": usage,
+            "latency": round(latency, 4)
+        }
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    async def create(self, timeout, **params):
+        started = time.monotonic()
+        result = await self.inner.create(timeout, **params)
+        if params.get("stream"):
+            return self._record_stream(params, result, started)
+
+        usage = getattr(result, "usage", None)
+        self._write(
+            params,
+            result.choices[0].message.content,
+            {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens
+            } if usage else None,
+            time.monotonic() - started
+        )
+        return result
+
+    async def _record_stream(self, params, stream, started):
+        parts = []
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            yield chunk
+        self._write(params, "".join(parts), None, time.monotonic() - started)
+
+
+def parse_latency(spec):
+    """
+    Latency distribution from a spec string, returning a sampler of seconds:
+    "recorded", "fixed:S", "uniform:LO,HI" or "lognormal:MU,SIGMA" (of ln seconds).
+    """
+    kind, _, args = (spec or "recorded").partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    if kind == "recorded":
+        return None
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+class ReplayTransport:
+    """
+    Serves recorded responses instead of calling Groq.
+    Requests are matched on their exact prompt first, then round-robin over
+    recordings made by the same LLM function with the same model, then with
+    any model. Latency, 429s and malformed JSON can be injected to exercise
+    the retry and parsing paths.
+    """
+
+    def __init__(self, path, latency=None, rate_limit_rate=0.0, malformed_rate=0.0,
+                 retry_after=1.0, chunk_chars=40, seed=None):
+        self.by_prompt = {}
+        by_task = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.by_prompt.setdefault(record["prompt_key"], record)
+                    if record.get("model"):
+                        by_task.setdefault((record["task_key"], record["model"]), []).append(record)
+                    by_task.setdefault((record["task_key"], None), []).append(record)
+        self.by_task = {key: itertools.cycle(records) for key, records in by_task.items()}
+
+        self.latency = parse_latency(latency)
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.retry_after = retry_after
+        self.chunk_chars = chunk_chars
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.environ["LLM_REPLAY_FILE"],
+            latency=os.getenv("LLM_REPLAY_LATENCY", "recorded"),
+            rate_limit_rate=float(os.getenv("LLM_REPLAY_RATE_LIMIT", 0)),
+            malformed_rate=float(os.getenv("LLM_REPLAY_MALFORMED", 0)),
+            retry_after=float(os.getenv("LLM_REPLAY_RETRY_AFTER", 1)),
+            seed=os.getenv("LLM_REPLAY_SEED")
+        )
+
+    def _match(self, params):
+        record = self.by_prompt.get(_prompt_key(params))
+        if record:
+            return record
+        task_key = _task_key(params)
+        with self._lock:
+            records = self.by_task.get((task_key, params.get("model"))) or self.by_task.get((task_key, None))
+            if records is None:
+                raise LookupError("No recorded response for this LLM call")
+            return next(records)
+
+    def _corrupt(self, content):
+        """Damage the response the way real models do"""
+        kind = self.rng.choice(["truncate", "trailing_comma", "fenced", "broken_string"])
+        if kind == "truncate":
+            return content[:self.rng.randint(len(content) // 3, max(len(content) - 1, 1))]
+        if kind == "trailing_comma":
+            return content.replace("}", ",}", 1).replace("]", ",]", 1)
+        if kind == "fenced":
+            return f"Here is the result:\n```json\n{content}\n```\nLet me know if you need anything else!"
+        position = content.find('"', len(content) // 2)
+        return content if position == -1 else content[:position] + content[position + 1:]
+
+    async def create(self, timeout, **params):
+        with self._lock:
+            delay = self.latency(self.rng) if self.latency else None
+            throttled = self.rng.random() < self.rate_limit_rate
+            malformed = self.rng.random() < self.malformed_rate
+
+        record = self._match(params)
+        if delay is None:
+            delay = record.get("latency") or 0
+
+        if throttled:
+            await asyncio.sleep(min(delay * 0.1, timeout))
+            raise LLMRateLimitError(retry_after=self.retry_after)
+
+        content = self._corrupt(record["content"]) if malformed else record["content"]
+        if params.get("stream"):
+            return self._stream(content, delay, timeout)
+
+        if delay > timeout:
+            await asyncio.sleep(timeout)
+            raise LLMTimeoutError("LLM request timed out")
+        await asyncio.sleep(delay)
+        return _completion(content, params.get("model"), record.get("usage"))
+
+    async def _stream(self, content, delay, timeout):
+        # A fifth of the latency goes to the first token, the rest is spread over the chunks
+        pieces = [content[i:i + self.chunk_chars] for i in range(0, len(content), self.chunk_chars)] or [""]
+        await asyncio.sleep(min(delay * 0.2, timeout))
+        step = delay * 0.8 / len(pieces)
+        for piece in pieces:
+            yield _chunk(piece)
+            await asyncio.sleep(step)
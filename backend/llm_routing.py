@@ -0,0 +1,69 @@
+# llm_routing.py
+# Which model serves which LLM task, and how long it may take.
+# Each task has an ordered list of model tiers and a latency budget; llm_client
+# tries the tiers in order, moving to the next (faster) tier when the current one
+# times out or is throttled. Configure without code changes via:
+#
+#   LLM_TIERS='{"fast": "llama-3.1-8b-instant"}'
+#   LLM_ROUTES='{"nutrition": {"tiers": ["large"], "budget": 12}}'
+#   LLM_ROUTES_FILE=routes.json   # {"tiers": {...}, "routes": {...}}
+
+import os
+import json
+from collections import namedtuple
+
+DEFAULT_TIERS = {
+    "large": "llama-3.3-70b-versatile",
+    "fast": "llama-3.1-8b-instant"
+}
+
+# budget: seconds for the whole call, across tiers and retries
+# primary_share: part of the budget a tier may use before the next tier takes over
+DEFAULT_ROUTES = {
+    "recipes": {"tiers": ["large", "fast"], "budget": 45},
+    "recipes_fanout": {"tiers": ["large", "fast"], "budget": float(os.getenv("RECIPE_FANOUT_TIMEOUT", 30))},
+    "recipes_stream": {"tiers": ["large", "fast"], "budget": 60},
+    "parse_ingredients": {"tiers": ["fast"], "budget": 15},
+    "nutrition": {"tiers": ["fast"], "budget": 10},
+    "nutrition_batch": {"tiers": ["fast"], "budget": 20},
+    "other": {"tiers": ["large"], "budget": 60}
+}
+DEFAULT_PRIMARY_SHARE = 0.6
+
+Route = namedtuple("Route", ["task", "models", "budget", "primary_share"])
+
+
+def _load_config():
+    tiers = dict(DEFAULT_TIERS)
+    routes = {task: dict(route) for task, route in DEFAULT_ROUTES.items()}
+
+    overrides = []
+    if os.getenv("LLM_ROUTES_FILE"):
+        with open(os.environ["LLM_ROUTES_FILE"], encoding="utf-8") as f:
+            config = json.load(f)
+        overrides.append((config.get("tiers") or {}, config.get("routes") or {}))
+    overrides.append((json.loads(os.getenv("LLM_TIERS", "{}")), json.loads(os.getenv("LLM_ROUTES", "{}"))))
+
+    for tier_overrides, route_overrides in overrides:
+        tiers.update(tier_overrides)
+        for task, route in route_overrides.items():
+            routes.setdefault(task, {}).update(route)
+
+    resolved = {}
+    for task, route in routes.items():
+        unknown = [tier for tier in route.get("tiers", []) if tier not in tiers]
+        if unknown or not route.get("tiers"):
+            raise ValueError(f"LLM route '{task}' uses unknown or no tiers: {unknown}")
+        resolved[task] = Route(
+            task=task,
+            models=[tiers[tier] for tier in route["tiers"]],
+            budget=float(route.get("budget", DEFAULT_ROUTES["other"]["budget"])),
+            primary_share=float(route.get("primary_share", DEFAULT_PRIMARY_SHARE))
+        )
+    return tiers, resolved
+
+TIERS, ROUTES = _load_config()
+
+def get_route(task):
+    """Route for task, falling back to the "other" route for unknown tasks"""
+    return ROUTES.get(task) or ROUTES["other"]._replace(task=task)
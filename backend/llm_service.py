@@ -4,32 +4,38 @@
 import os
 import json
 import re
-from groq import Groq
+import logging
+from datetime import date, datetime, timedelta
 from dotenv import load_dotenv
+from difflib import SequenceMatcher
+from llm_client import chat_completion, chat_completion_fanout, stream_chat_completion, LLMError
+from metrics import record_result
+
+logger = logging.getLogger(__name__)
 
 # 1. Try loading from current directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
 env_path = os.path.join(current_dir, '.env')
-print(f"Looking for .env at: {env_path}")
+logger.debug(f"Looking for .env at: {env_path}")
 
 if os.path.exists(env_path):
-    print(".env file found!")
+    logger.debug(".env file found")
     load_dotenv(env_path)
 else:
-    print(".env file NOT found at expected path!")
+    logger.warning(f".env file not found at {env_path}")
 
 # 2. Fallback: Try manual read if load_dotenv fails
 if not os.getenv("GROQ_API_KEY"):
-    print("GROQ_API_KEY not found in env, trying manual read...")
+    logger.info("GROQ_API_KEY not found in env, trying manual read")
     try:
         with open(env_path, 'r', encoding='utf-8-sig') as f: # Try with BOM
             for line in f:
                 if line.startswith("GROQ_API_KEY="):
                     key = line.strip().split("=", 1)[1]
                     os.environ["GROQ_API_KEY"] = key
-                    print("Manually loaded GROQ_API_KEY")
+                    logger.info("Manually loaded GROQ_API_KEY")
     except Exception as e:
-        print(f"Manual read failed: {e}")
+        logger.warning(f"Manual read failed: {e}")
         # Try without BOM
         try:
             with open(env_path, 'r', encoding='utf-8') as f:
@@ -37,34 +43,294 @@ if not os.getenv("GROQ_API_KEY"):
                     if line.startswith("GROQ_API_KEY="):
                         key = line.strip().split("=", 1)[1]
                         os.environ["GROQ_API_KEY"] = key
-                        print("Manually loaded GROQ_API_KEY (utf-8)")
+                        logger.info("Manually loaded GROQ_API_KEY (utf-8)")
         except Exception as e2:
-            print(f"Manual read failed again: {e2}")
+            logger.warning(f"Manual read failed again: {e2}")
 
-# Initialize Groq client (FREE API - No credit card needed)
+# Groq calls go through llm_client, which picks the model for each task from
+# llm_routing (FREE API - No credit card needed)
 # Get your API key from: https://console.groq.com/
-client = Groq(api_key=os.getenv("GROQ_API_KEY", ""))
 
-def generate_recipes(ingredients, preferences, meal_type="Dinner"):
+# Bump whenever the recipe prompt changes so cached generations are not reused
+RECIPE_PROMPT_VERSION = 2
+
+DEFAULT_RECIPE_COUNT = 6
+MAX_RECIPE_COUNT = 10
+# Token budget for the fridge section of the recipe prompt
+RECIPE_PROMPT_TOKEN_BUDGET = int(os.getenv("RECIPE_PROMPT_TOKEN_BUDGET", 600))
+# Completion tokens reserved per requested recipe, plus fixed headroom
+RECIPE_TOKENS_PER_RECIPE = int(os.getenv("RECIPE_TOKENS_PER_RECIPE", 650))
+RECIPE_TOKENS_OVERHEAD = 200
+RECIPE_MAX_TOKENS = int(os.getenv("RECIPE_MAX_TOKENS", 8000))
+# Split one generation into this many concurrent smaller completions (1 = off)
+RECIPE_FANOUT = int(os.getenv("RECIPE_FANOUT", 1))
+# JSON Lines file collecting malformed responses for bench_json_extraction.py (unset = off)
+LLM_CAPTURE_PATH = os.getenv("LLM_CAPTURE_PATH")
+
+FALLBACK_RECIPE_NAME = "Simple Healthy Meal"
+
+def is_fallback_result(recipes):
+    """True if recipes is the canned fallback returned when the LLM call failed"""
+    return len(recipes) == 1 and recipes[0].get("name") == FALLBACK_RECIPE_NAME
+
+# -------------------------
+# Tolerant JSON extraction
+# -------------------------
+
+_OUTSIDE_STRING = re.compile(r'[{}\[\]",]')
+_INSIDE_STRING = re.compile(r'["\\]')
+_TRAILING_COMMA = re.compile(r',\s*([\]}])')
+_DECODER = json.JSONDecoder()
+# Keys of single-key objects that wrap the record list rather than being a record
+_WRAPPER_KEYS = ("recipes", "ingredients", "items", "results")
+
+class JSONObjectStream:
     """
-    Generate recipes based on user's fridge ingredients and preferences.
-    
-    Args:
-        ingredients: List of ingredient objects
-        preferences: User preference object
-        meal_type: Breakfast, Lunch, Dinner, etc.
+    Single-pass, incremental extractor for JSON objects in LLM output.
+
+    feed() returns every record object completed by the chunk: objects that are
+    not nested inside another object (top-level, or inside arrays only). It
+    ignores markdown fences and prose around the JSON, tolerates stray brackets
+    in that prose, drops trailing commas while scanning, and skips a malformed
+    record without losing the others. A truncated final record is simply never
+    emitted. This is the slow path; extract_json_objects() tries json.loads first.
     """
-    
-    # Build ingredient list string
-    ingredient_list = []
-    for ing in ingredients:
+
+    def __init__(self):
+        self._stack = []        # open containers: '{' or '['
+        self._record_depth = None  # stack depth at which the current record started
+        self._buf = []
+        self._in_string = False
+        self._escape = False
+        self._held_comma = False  # comma whose fate depends on the next token
+        self.dropped = 0        # malformed records skipped so far
+
+    def _emit(self, piece):
+        if self._record_depth is not None and piece:
+            if self._held_comma and piece.strip():
+                self._buf.append(',')
+                self._held_comma = False
+            self._buf.append(piece)
+
+    def feed(self, text):
+        records = []
+        i, n = 0, len(text)
+        if self._escape and n:
+            self._emit(text[0])
+            self._escape = False
+            i = 1
+
+        while i < n:
+            if self._in_string:
+                m = _INSIDE_STRING.search(text, i)
+                if not m:
+                    self._emit(text[i:])
+                    break
+                j = m.end()
+                if text[j - 1] == '\\':
+                    if j < n:
+                        j += 1
+                    else:
+                        self._escape = True
+                else:
+                    self._in_string = False
+                self._emit(text[i:j])
+                i = j
+                continue
+
+            m = _OUTSIDE_STRING.search(text, i)
+            if not m:
+                if self._stack:
+                    self._emit(text[i:])
+                break
+            j = m.start()
+            ch = text[j]
+            if self._stack:
+                self._emit(text[i:j])
+            i = j + 1
+
+            if ch == ',':
+                if self._record_depth is not None:
+                    self._held_comma = True
+                continue
+            if self._held_comma:
+                # Trailing comma before a closer is dropped, otherwise kept
+                self._held_comma = False
+                if ch not in '}]':
+                    self._buf.append(',')
+
+            if ch == '"':
+                # Quotes in prose outside any JSON container are not strings
+                if self._stack:
+                    self._in_string = True
+                    self._emit(ch)
+            elif ch in '{[':
+                # An object opened outside any other object starts a record; an
+                # unmatched '[' in the prose before it must not hide it
+                if ch == '{' and self._record_depth is None and '{' not in self._stack:
+                    # Well-formed records complete in this chunk decode in one C call
+                    try:
+                        parsed, end = _DECODER.raw_decode(text, j)
+                    except json.JSONDecodeError:
+                        pass
+                    else:
+                        records.extend(_unwrap(parsed) if not self._stack else [parsed])
+                        i = end
+                        continue
+                    self._record_depth = len(self._stack)
+                    self._buf = []
+                self._stack.append(ch)
+                self._emit(ch)
+            else:
+                opener = '{' if ch == '}' else '['
+                if not self._stack or self._stack[-1] != opener:
+                    continue
+                self._stack.pop()
+                self._emit(ch)
+                if self._record_depth is not None and len(self._stack) == self._record_depth:
+                    records.extend(self._decode(''.join(self._buf), top_level=not self._stack))
+                    self._record_depth = None
+                    self._buf = []
+        return records
+
+    def _decode(self, record_text, top_level):
+        try:
+            parsed = json.loads(record_text)
+        except json.JSONDecodeError as e:
+            self.dropped += 1
+            logger.warning(f"Skipping malformed JSON record: {e}")
+            return []
+        return _unwrap(parsed) if top_level else [parsed]
+
+def _unwrap(parsed):
+    """Records of a top-level {"recipes": [...]}-style wrapper, else [parsed]"""
+    if len(parsed) == 1:
+        key, value = next(iter(parsed.items()))
+        if key in _WRAPPER_KEYS and isinstance(value, list):
+            return [v for v in value if isinstance(v, dict)]
+    return [parsed]
+
+def _fenced_block(text):
+    """Contents of the first ``` fenced block, or text when there is none"""
+    start = text.find("```")
+    if start == -1:
+        return text
+    start = text.find("\n", start)
+    end = text.find("```", start + 1) if start != -1 else -1
+    return text[start:end] if end != -1 else text[start:]
+
+def _parse_whole(text):
+    """
+    Records if text (or its fenced block) is one valid JSON document, allowing
+    for trailing commas, else None
+    """
+    candidate = _fenced_block(text)
+    try:
+        parsed = json.loads(candidate)
+    except ValueError:
+        try:
+            parsed = json.loads(_TRAILING_COMMA.sub(r'\1', candidate))
+        except ValueError:
+            return None
+    if isinstance(parsed, dict):
+        return _unwrap(parsed)
+    if isinstance(parsed, list):
+        return [item for item in parsed if isinstance(item, dict)] or None
+    return None
+
+def _capture(text, records):
+    """Append a response that needed the slow path to LLM_CAPTURE_PATH (see bench_json_extraction.py)"""
+    try:
+        with open(LLM_CAPTURE_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"text": text, "recovered": len(records)}) + "\n")
+    except OSError as e:
+        logger.warning(f"Could not capture LLM response: {e}")
+
+def extract_json_objects(text):
+    """
+    All record objects recoverable from a complete LLM response. Well-formed
+    responses (optionally fenced) go straight through json.loads; anything else
+    falls back to the tolerant JSONObjectStream scanner.
+    """
+    text = text or ""
+    records = _parse_whole(text)
+    if records is not None:
+        return records
+    records = JSONObjectStream().feed(text)
+    if LLM_CAPTURE_PATH:
+        _capture(text, records)
+    return records
+
+# -------------------------
+# Prompt budgeting
+# -------------------------
+
+# Ingredients that suit a meal type are preferred when the fridge must be trimmed
+_MEAL_TYPE_HINTS = {
+    "Breakfast": ["egg", "milk", "oat", "yogurt", "bread", "banana", "berry", "apple", "cheese", "avocado"],
+    "Lunch": ["chicken", "rice", "pasta", "tuna", "bread", "spinach", "tomato", "cheese", "bean"],
+    "Dinner": ["chicken", "beef", "pork", "salmon", "fish", "rice", "pasta", "potato", "broccoli", "tofu"],
+    "Snack": ["apple", "banana", "almond", "nut", "yogurt", "cheese", "carrot", "berry"],
+}
+
+def estimate_tokens(text):
+    """Rough token count for Llama-family tokenizers (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+def recipe_max_tokens(count):
+    """Completion budget sized to the number of recipes requested"""
+    return min(RECIPE_TOKENS_OVERHEAD + RECIPE_TOKENS_PER_RECIPE * count, RECIPE_MAX_TOKENS)
+
+def _ingredient_rank(ing, meal_type, today):
+    """Sort key: relevant and soon-to-expire first, expired items last"""
+    try:
+        days_left = (datetime.strptime(ing.get('expiryDate') or '', "%Y-%m-%d").date() - today).days
+    except ValueError:
+        days_left = None
+    name = (ing.get('name') or '').lower()
+    relevant = any(hint in name for hint in _MEAL_TYPE_HINTS.get(meal_type, []))
+    if days_left is None:
+        expiry_rank = (1, 0)
+    elif days_left < 0:
+        expiry_rank = (2, -days_left)
+    else:
+        expiry_rank = (0, days_left)
+    return (expiry_rank[0], not relevant, expiry_rank[1])
+
+def _budget_ingredients_text(ingredients, meal_type, budget=None):
+    """
+    Compact fridge listing ("Egg (2 pcs); Milk (1 L); ...") that fits the token budget.
+    Ingredients are ranked by expiry and meal-type relevance before trimming.
+    """
+    budget = RECIPE_PROMPT_TOKEN_BUDGET if budget is None else budget
+    today = date.today()
+    ranked = sorted(ingredients, key=lambda ing: _ingredient_rank(ing, meal_type, today))
+
+    entries = []
+    used = 0
+    for ing in ranked:
         qty = f"{ing.get('quantity', '')} {ing.get('unit', '')}".strip()
-        if qty:
-            ingredient_list.append(f"- {ing['name']} ({qty})")
-        else:
-            ingredient_list.append(f"- {ing['name']}")
-    
-    ingredients_text = "\n".join(ingredient_list) if ingredient_list else "No specific ingredients available"
+        entry = f"{ing['name']} ({qty})" if qty else ing['name']
+        cost = estimate_tokens(entry + "; ")
+        if entries and used + cost > budget:
+            break
+        entries.append(entry)
+        used += cost
+
+    if not entries:
+        return "No specific ingredients available"
+    text = "; ".join(entries)
+    omitted = len(ranked) - len(entries)
+    if omitted:
+        text += f" (+{omitted} more items not listed)"
+    return text
+
+def _build_recipe_prompts(ingredients, preferences, meal_type, count=DEFAULT_RECIPE_COUNT, hint=None):
+    """
+    Build the (system, user) prompt pair shared by the blocking and streaming calls.
+    hint is an optional style direction used to keep fan-out batches from overlapping.
+    """
+    ingredients_text = _budget_ingredients_text(ingredients, meal_type)
     
     # Build preferences context
     diet_info = f"Dietary requirement: {preferences.get('dietType', 'No Restriction')}"
@@ -73,6 +339,7 @@ def generate_recipes(ingredients, preferences, meal_type="Dinner"):
     allergies_text = f"Allergies/Intolerances: {', '.join(allergies)}" if allergies else "No known allergies"
     goals = preferences.get('goals', [])
     goals_text = f"Health goals: {', '.join(goals)}" if goals else "General health"
+    variety_text = f"9. VARIETY: {hint}" if hint else ""
     
     # Structured Prompt Engineering
     system_prompt = """You are a professional nutritionist and chef AI assistant. 
@@ -81,7 +348,7 @@ Always provide accurate nutritional information and clear, step-by-step cooking
 IMPORTANT: You must identify which ingredients are available in the user's fridge and which ones are missing.
 Return your response as a valid JSON array of recipe objects."""
 
-    user_prompt = f"""Generate 6 creative and healthy {meal_type} recipes using the following ingredients from the user's fridge:
+    user_prompt = f"""Generate {count} creative and healthy {meal_type} recipes using the following ingredients from the user's fridge:
 
 AVAILABLE INGREDIENTS (Fridge):
 {ingredients_text}
@@ -107,6 +374,7 @@ REQUIREMENTS:
      If fridge has "Milk (1 liter)", use "ml" or "liter", do not use "cups".
    - 'missing_ingredients': List of ingredients that need to be purchased (name, quantity, unit).
 8. PRIORITIZE using the available ingredients as much as possible.
+{variety_text}
 
 OUTPUT FORMAT (JSON array):
 [
@@ -131,90 +399,117 @@ OUTPUT FORMAT (JSON array):
 
 IMPORTANT: Return ONLY valid JSON."""
 
+    return system_prompt, user_prompt
+
+def generate_recipes(ingredients, preferences, meal_type="Dinner", count=DEFAULT_RECIPE_COUNT):
+    """
+    Generate recipes based on user's fridge ingredients and preferences.
+    
+    Args:
+        ingredients: List of ingredient objects
+        preferences: User preference object
+        meal_type: Breakfast, Lunch, Dinner, etc.
+        count: Number of recipes to ask for
+    """
+    fanout = min(RECIPE_FANOUT, count)
+    if fanout > 1:
+        return _generate_recipes_fanout(ingredients, preferences, meal_type, count, fanout)
+
+    system_prompt, user_prompt = _build_recipe_prompts(ingredients, preferences, meal_type, count)
+
     try:
-        # Debug: Check API Key
-        api_key = os.getenv("GROQ_API_KEY", "")
-        if not api_key:
-            print("Error: GROQ_API_KEY is missing in environment variables.")
-            raise ValueError("GROQ_API_KEY not found")
-        print(f"Using Groq API Key: {api_key[:5]}... (length: {len(api_key)})")
-
-        # Call Groq API (using latest Llama 3.3 model)
-        chat_completion = client.chat.completions.create(
+        # Call Groq API (model tier chosen by the "recipes" route)
+        completion = chat_completion(
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            model="llama-3.3-70b-versatile",  # Updated to latest supported model
             temperature=0.7,
-            max_tokens=4000 # Increased token limit for 6 recipes
+            max_tokens=recipe_max_tokens(count),
+            task="recipes"
         )
         
-        response_text = chat_completion.choices[0].message.content
-        
-        # Parse JSON response
-        # Groq sometimes wraps JSON in markdown, so we extract it
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0].strip()
-        
-        # Try to parse as JSON object first (if wrapped in {"recipes": [...]})
-        try:
-            # Clean up response text (sometimes LLMs add comments or markdown outside JSON)
-            # Find the first '[' and the last ']'
-            start_idx = response_text.find('[')
-            end_idx = response_text.rfind(']')
-            
-            if start_idx != -1 and end_idx != -1:
-                json_str = response_text[start_idx:end_idx+1]
-                recipes = json.loads(json_str)
-            else:
-                # Fallback: try full text
-                parsed = json.loads(response_text)
-                if "recipes" in parsed:
-                    recipes = parsed["recipes"]
-                elif isinstance(parsed, list):
-                    recipes = parsed
-                else:
-                    recipes = [parsed] if parsed else []
-                    
-        except json.JSONDecodeError as json_err:
-            print(f"JSON Parse Error: {json_err}")
-            print(f"Raw LLM Response: {response_text}")
-            
-            # Extreme Fallback: Try to fix common trailing comma issue or truncated JSON
-            try:
-                import re
-                # Remove trailing commas before closing braces/brackets
-                fixed_json = re.sub(r',\s*([\]}])', r'\1', response_text)
-                
-                # Attempt to close truncated JSON array
-                if '[' in fixed_json and not fixed_json.strip().endswith(']'):
-                    # Find the last complete object closing '}'
-                    last_brace = fixed_json.rfind('}')
-                    if last_brace != -1:
-                        # Cut off at the last complete object and close the array
-                        fixed_json = fixed_json[:last_brace+1] + ']'
-                        print("Attempted to auto-close truncated JSON array")
-
-                start_idx = fixed_json.find('[')
-                end_idx = fixed_json.rfind(']')
-                if start_idx != -1 and end_idx != -1:
-                    recipes = json.loads(fixed_json[start_idx:end_idx+1])
-                else:
-                    raise Exception("Could not extract JSON array")
-            except Exception as e2:
-                print(f"Fix attempt failed: {e2}")
-                recipes = []
+        response_text = completion.choices[0].message.content
         
-        return recipes if isinstance(recipes, list) else []
+        # Groq sometimes wraps JSON in markdown, adds prose, leaves trailing
+        # commas or runs out of tokens; keep every recipe that came through intact
+        recipes = extract_json_objects(response_text)
+        record_result("recipes", "ok" if recipes else "parse_failure")
+        # The model sometimes sends extra recipes; callers cache the result under count
+        return recipes[:count]
         
+    except LLMError:
+        # Rate limits, timeouts and config errors are reported to the caller as-is
+        raise
     except Exception as e:
-        print(f"Error calling Groq API: {str(e)}")
-        # Fallback: return a simple mock recipe
-        return [{
-            "name": "Simple Healthy Meal",
+        logger.exception(f"Error calling Groq API: {str(e)}")
+        record_result("recipes", "fallback")
+        return _fallback_recipes(ingredients)
+
+# Style directions handed to fan-out batches so they explore different dishes
+_FANOUT_HINTS = [
+    "Focus on quick dishes ready in under 20 minutes.",
+    "Focus on light, fresh dishes such as salads, bowls or soups.",
+    "Focus on hearty, comforting home-style dishes.",
+    "Focus on dishes from different world cuisines.",
+    "Focus on one-pan or sheet-pan dishes with minimal cleanup.",
+]
+
+def _is_near_duplicate(name, seen):
+    name = " ".join(sorted((name or "").lower().split()))
+    return any(SequenceMatcher(None, name, other).ratio() >= 0.85 for other in seen), name
+
+def _generate_recipes_fanout(ingredients, preferences, meal_type, count, fanout):
+    """
+    Ask for count recipes as fanout concurrent smaller completions with different
+    style hints, then merge what finished within the recipes_fanout latency budget.
+    Near-duplicate recipe names across batches are dropped.
+    """
+    shares = [count // fanout + (1 if i < count % fanout else 0) for i in range(fanout)]
+    requests = []
+    for i, share in enumerate(shares):
+        system_prompt, user_prompt = _build_recipe_prompts(
+            ingredients, preferences, meal_type, share, hint=_FANOUT_HINTS[i % len(_FANOUT_HINTS)]
+        )
+        requests.append({
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.7,
+            "max_tokens": recipe_max_tokens(share)
+        })
+
+    results = chat_completion_fanout(requests, task="recipes_fanout")
+
+    recipes = []
+    seen = []
+    errors = []
+    for result in results:
+        if isinstance(result, Exception):
+            errors.append(result)
+            continue
+        batch = extract_json_objects(result.choices[0].message.content)
+        record_result("recipes_fanout", "ok" if batch else "parse_failure")
+        for recipe in batch:
+            duplicate, key = _is_near_duplicate(recipe.get("name"), seen)
+            if not duplicate:
+                seen.append(key)
+                recipes.append(recipe)
+
+    if recipes:
+        return recipes[:count]
+    llm_errors = [e for e in errors if isinstance(e, LLMError)]
+    if llm_errors:
+        raise llm_errors[0]
+    logger.warning(f"Fan-out recipe generation produced nothing: {errors}")
+    record_result("recipes_fanout", "fallback")
+    return _fallback_recipes(ingredients)
+
+def _fallback_recipes(ingredients):
+    """Canned recipe returned when generation fails for reasons other than LLMError"""
+    return [{
+            "name": FALLBACK_RECIPE_NAME,
             "description": "A quick and healthy meal using your available ingredients.",
             "ingredients": [ing.get('name', 'Ingredient') for ing in ingredients[:3]],
             "instructions": [
@@ -233,6 +528,36 @@ IMPORTANT: Return ONLY valid JSON."""
             "tags": ["quick", "healthy"]
         }]
 
+def stream_recipes(ingredients, preferences, meal_type="Dinner", count=DEFAULT_RECIPE_COUNT):
+    """
+    Streaming variant of generate_recipes(): yields each recipe dict as soon as
+    the model has emitted its closing brace. Errors propagate to the caller.
+    """
+    system_prompt, user_prompt = _build_recipe_prompts(ingredients, preferences, meal_type, count)
+
+    deltas = stream_chat_completion(
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0.7,
+        max_tokens=recipe_max_tokens(count),
+        task="recipes_stream"
+    )
+
+    parser = JSONObjectStream()
+    produced = 0
+    for delta in deltas:
+        for recipe in parser.feed(delta):
+            produced += 1
+            yield recipe
+            if produced == count:
+                break
+        if produced == count:
+            deltas.close()  # stop reading the extra recipes
+            break
+    record_result("recipes_stream", "ok" if produced else "parse_failure")
+
 def parse_ingredients_from_text(text):
     """
     Parse natural language text into structured ingredient list with nutrition info.
@@ -273,44 +598,52 @@ OUTPUT FORMAT (JSON array):
 Provide accurate nutrition information per 100g for each ingredient. Return ONLY valid JSON, no additional text."""
 
     try:
-        api_key = os.getenv("GROQ_API_KEY", "")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY not found")
-
-        chat_completion = client.chat.completions.create(
+        completion = chat_completion(
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            model="llama-3.3-70b-versatile",
             temperature=0.3,  # Lower temperature for more consistent parsing
-            max_tokens=1000
+            max_tokens=1000,
+            task="parse_ingredients"
         )
         
-        response_text = chat_completion.choices[0].message.content
-        
-        # Extract JSON array
-        start_idx = response_text.find('[')
-        end_idx = response_text.rfind(']')
+        response_text = completion.choices[0].message.content
         
-        if start_idx != -1 and end_idx != -1:
-            json_str = response_text[start_idx:end_idx+1]
-            ingredients = json.loads(json_str)
-            return ingredients if isinstance(ingredients, list) else []
-        else:
-            return []
+        ingredients = extract_json_objects(response_text)
+        record_result("parse_ingredients", "ok" if ingredients else "parse_failure")
+        return ingredients
             
+    except LLMError:
+        raise
     except Exception as e:
-        print(f"Error parsing ingredients: {str(e)}")
+        logger.exception(f"Error parsing ingredients: {str(e)}")
+        record_result("parse_ingredients", "fallback")
         return []
 
+def _nutrition_from_parsed(parsed):
+    """Validate one parsed nutrition object into the response shape"""
+    result = {
+        "calories": float(parsed.get("calories", 0)),
+        "protein": float(parsed.get("protein", 0)),
+        "carbs": float(parsed.get("carbs", 0)),
+        "fat": float(parsed.get("fat", 0))
+    }
+    # Add suggested expiry date if provided
+    if "suggestedExpiryDate" in parsed:
+        result["suggestedExpiryDate"] = parsed["suggestedExpiryDate"]
+    return result
+
+def _example_expiry():
+    """Example expiry date for nutrition prompts; a fixed date would soon lie in the past"""
+    return (date.today() + timedelta(days=7)).isoformat()
+
 def get_nutrition_info(ingredient_name):
     """
     Get nutrition information (per 100g) and suggested expiry date for an ingredient using LLM.
-    Returns: dict with calories, protein, carbs, fat, suggestedExpiryDate
+    Returns: dict with calories, protein, carbs, fat, suggestedExpiryDate, or None if unparseable.
+    Raises: LLMError (e.g. LLMRateLimitError) when the API call itself fails.
     """
-    from datetime import datetime, timedelta
-    
     system_prompt = """You are a nutrition and food safety expert. Given an ingredient name, provide:
 1. Accurate nutrition information per 100g
 2. A suggested expiry date (typical shelf life from today)
@@ -318,7 +651,7 @@ Return ONLY a valid JSON object with these exact fields: calories, protein, carb
 All nutrition values should be numbers (floats or integers).
 suggestedExpiryDate should be in YYYY-MM-DD format, representing a typical expiry date from today."""
     
-    user_prompt = f"""What is the nutrition information per 100g for "{ingredient_name}" and what is a typical expiry date (from today)?
+    user_prompt = f"""Today is {date.today().isoformat()}. What is the nutrition information per 100g for "{ingredient_name}" and what is a typical expiry date (from today)?
     
     Consider typical shelf life:
     - Fresh produce (fruits, vegetables): 3-7 days
@@ -333,58 +666,106 @@ suggestedExpiryDate should be in YYYY-MM-DD format, representing a typical expir
       "protein": 0.3,
       "carbs": 14,
       "fat": 0.2,
-      "suggestedExpiryDate": "2025-12-10"
+      "suggestedExpiryDate": "{_example_expiry()}"
     }}
     
     Return ONLY the JSON object, no additional text or markdown."""
     
     try:
-        api_key = os.getenv("GROQ_API_KEY", "")
-        if not api_key:
-            # Graceful failure when API key isn't configured
-            return {"error": "missing_api_key", "message": "GROQ_API_KEY is not set."}
-
-        chat_completion = client.chat.completions.create(
+        completion = chat_completion(
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            model="llama-3.3-70b-versatile",
             temperature=0.2, # Low temperature for factual data
-            max_tokens=200
+            max_tokens=200,
+            task="nutrition"
         )
-        response_text = chat_completion.choices[0].message.content
+        response_text = completion.choices[0].message.content
         
         # Extract JSON from response
-        json_match = re.search(r'\{[^}]+\}', response_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            # Remove trailing commas
-            json_str = re.sub(r',\s*([}])', r'\1', json_str)
-            parsed = json.loads(json_str)
-            
-            # Validate and return
-            result = {
-                "calories": float(parsed.get("calories", 0)),
-                "protein": float(parsed.get("protein", 0)),
-                "carbs": float(parsed.get("carbs", 0)),
-                "fat": float(parsed.get("fat", 0))
-            }
-            # Add suggested expiry date if provided
-            if "suggestedExpiryDate" in parsed:
-                result["suggestedExpiryDate"] = parsed["suggestedExpiryDate"]
+        parsed = extract_json_objects(response_text)
+        if parsed:
+            result = _nutrition_from_parsed(parsed[0])
+            record_result("nutrition", "ok")
             return result
         else:
-            print(f"No JSON found in LLM response: {response_text}")
+            logger.warning(f"No JSON found in LLM response: {response_text}")
+            record_result("nutrition", "parse_failure")
             return None
             
+    except LLMError:
+        # Rate limits, missing API key etc. are surfaced as structured errors
+        raise
     except Exception as e:
-        error_str = str(e)
-        print(f"Error calling Groq API for nutrition info: {error_str}")
-        
-        # Check for rate limit error
-        if "rate_limit" in error_str.lower() or "429" in error_str:
-            print("⚠️ Rate limit reached. Consider using cached data or waiting.")
-            return {"error": "rate_limit", "message": "API rate limit reached. Please try again later."}
-        
+        logger.exception(f"Error parsing nutrition info: {str(e)}")
+        record_result("nutrition", "parse_failure")
         return None
+
+def get_nutrition_info_batch(ingredient_names):
+    """
+    Nutrition lookup for several ingredients in a single LLM call.
+    Returns: dict mapping each requested name to the get_nutrition_info() shape,
+    or None for names the model did not answer.
+    Raises: LLMError when the API call itself fails.
+    """
+    if not ingredient_names:
+        return {}
+
+    system_prompt = """You are a nutrition and food safety expert. Given a list of ingredient names, provide for each:
+1. Accurate nutrition information per 100g
+2. A suggested expiry date (typical shelf life from today)
+Return ONLY a valid JSON array with one object per ingredient, in the same order, with these exact fields:
+name, calories, protein, carbs, fat, suggestedExpiryDate.
+"name" must repeat the ingredient name exactly as given. All nutrition values should be numbers.
+suggestedExpiryDate should be in YYYY-MM-DD format, representing a typical expiry date from today."""
+
+    names_text = "\n".join(f"- {name}" for name in ingredient_names)
+    user_prompt = f"""Today is {date.today().isoformat()}. Provide nutrition per 100g and a typical expiry date for each ingredient:
+{names_text}
+
+    Consider typical shelf life:
+    - Fresh produce (fruits, vegetables): 3-7 days
+    - Dairy (milk, yogurt): 5-7 days
+    - Meat, poultry: 1-3 days
+    - Eggs: 3-5 weeks
+    - Dry goods (rice, pasta): 6-12 months
+
+    Return a JSON array in this exact format:
+    [
+      {{ "name": "Apple", "calories": 52, "protein": 0.3, "carbs": 14, "fat": 0.2, "suggestedExpiryDate": "{_example_expiry()}" }}
+    ]
+
+    Return ONLY the JSON array, no additional text or markdown."""
+
+    completion = chat_completion(
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0.2,
+        max_tokens=100 + 80 * len(ingredient_names),
+        task="nutrition_batch"
+    )
+    response_text = completion.choices[0].message.content
+
+    results = {name: None for name in ingredient_names}
+    by_name = {name.strip().lower(): name for name in ingredient_names}
+    items = extract_json_objects(response_text)
+    for position, item in enumerate(items):
+        # Match on the echoed name. Position is only trusted when the name is
+        # missing and the answer lines up one-to-one with the request; anything
+        # else unmatched stays unanswered rather than risk another item's data.
+        echoed = str(item.get("name") or "").strip()
+        name = by_name.get(echoed.lower())
+        if name is None and not echoed and len(items) == len(ingredient_names):
+            name = ingredient_names[position]
+        if name is None or results.get(name) is not None:
+            continue
+        try:
+            results[name] = _nutrition_from_parsed(item)
+        except (TypeError, ValueError):
+            continue
+    answered = sum(1 for value in results.values() if value is not None)
+    record_result("nutrition_batch", "ok" if answered == len(results) else "partial" if answered else "parse_failure")
+    return results
@@ -0,0 +1,175 @@
+# metrics.py
+# Minimal in-process Prometheus-style metrics (counters, gauges, histograms)
+# rendered in the text exposition format by GET /metrics.
+# Values are per process; scrape every worker.
+
+import threading
+import contextvars
+
+_registry = []
+_lock = threading.Lock()
+
+# Flask endpoint (or background task name) that LLM calls made by this thread belong to
+_endpoint = contextvars.ContextVar("llm_endpoint", default="unknown")
+
+def set_endpoint(name):
+    _endpoint.set(name or "unknown")
+
+def current_endpoint():
+    return _endpoint.get()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        with _lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if len(labels) != len(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}")
+        return tuple(str(v) for v in labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with _lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Gauge whose value is read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, callback):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def render(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            f"{self.name} {_format_value(self.callback())}"
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=()):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        with _lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def _render_series(self, key, series):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, series["counts"]):
+            cumulative += count
+            labels = _format_labels(self.labels, key, {"le": _format_value(bound)})
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labels, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+        lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+def render():
+    """All registered metrics in the Prometheus text format"""
+    with _lock:
+        metrics = list(_registry)
+    return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+# -------------------------
+# LLM metrics
+# -------------------------
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60)
+
+LLM_REQUESTS = Counter(
+    "llm_requests_total",
+    "LLM calls by triggering endpoint, task, model and outcome (ok or the LLMError code)",
+    ("endpoint", "task", "model", "outcome")
+)
+LLM_ATTEMPTS = Counter(
+    "llm_attempts_total",
+    "Individual upstream attempts including retries, by result",
+    ("endpoint", "task", "model", "result")
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported by the API usage block",
+    ("endpoint", "task", "model", "kind")
+)
+LLM_DURATION = Histogram(
+    "llm_request_duration_seconds",
+    "Wall time of LLM calls including retries and backoff",
+    ("endpoint", "task", "model", "outcome"),
+    LATENCY_BUCKETS
+)
+LLM_FALLBACKS = Counter(
+    "llm_fallbacks_total",
+    "Calls handed from one model tier to the next, by the error that caused it",
+    ("endpoint", "task", "from_model", "to_model", "reason")
+)
+LLM_TTFT = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time until the first streamed token arrived",
+    ("endpoint", "task", "model"),
+    LATENCY_BUCKETS
+)
+LLM_RESULTS = Counter(
+    "llm_results_total",
+    "What became of LLM responses: ok, partial, parse_failure or fallback",
+    ("endpoint", "task", "outcome")
+)
+
+def record_result(task, outcome):
+    LLM_RESULTS.inc(current_endpoint(), task, outcome)
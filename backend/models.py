@@ -24,6 +24,18 @@ class CommonIngredient(db.Document):
     carbs = db.FloatField(default=0)
     fat = db.FloatField(default=0)
     category = db.StringField()  # e.g., "Vegetable", "Fruit", "Meat"
+    popularity = db.IntField(default=0)  # times added to a fridge; ranks search results
+    # Lookup keys for entries outside the in-process snapshot (see catalog.py)
+    name_key = db.StringField()  # normalized name
+    base_key = db.StringField()  # normalized name without its qualifier
+
+    meta = {
+        'indexes': [
+            'name_key',
+            'base_key',
+            '-popularity'
+        ]
+    }
 
     def to_json(self):
         return {
@@ -48,6 +60,12 @@ class UserDefinedIngredient(db.Document):
     fat = db.FloatField(default=0)
     created_at = db.DateTimeField(default=datetime.datetime.utcnow)
 
+    meta = {
+        'indexes': [
+            ('user', 'name')  # per-user lookups by name (add, nutrition, search)
+        ]
+    }
+
     def to_json(self):
         return {
             "id": str(self.id),
@@ -73,6 +91,12 @@ class Ingredient(db.Document):
     fat = db.FloatField(default=0)
     created_at = db.DateTimeField(default=datetime.datetime.utcnow)
 
+    meta = {
+        'indexes': [
+            'user'  # fridge listing and (id, user) ownership checks
+        ]
+    }
+
     def to_json(self):
         return {
             "id": str(self.id),
@@ -116,6 +140,12 @@ class DailyCalorieLog(db.Document):
     note = db.StringField()
     created_at = db.DateTimeField(default=datetime.datetime.utcnow)
 
+    meta = {
+        'indexes': [
+            ('user', 'date', 'id')  # date-range entry pages, in a stable order
+        ]
+    }
+
     def to_json(self):
         return {
             "id": str(self.id),
@@ -126,6 +156,20 @@ class DailyCalorieLog(db.Document):
             "createdAt": self.created_at.isoformat()
         }
 
+class DailyCalorieRollup(db.Document):
+    """Per-user calorie total for one day, kept current with $inc as entries are logged"""
+    user = db.ReferenceField(User, required=True)
+    date = db.DateField(required=True)
+    calories = db.FloatField(default=0)
+    entries = db.IntField(default=0)
+    updated_at = db.DateTimeField()
+
+    meta = {
+        'indexes': [
+            {'fields': ('user', 'date'), 'unique': True}
+        ]
+    }
+
 class SavedRecipe(db.Document):
     """User's saved/favorited recipes"""
     user = db.ReferenceField(User, required=True)
@@ -141,6 +185,13 @@ class SavedRecipe(db.Document):
     meal_type = db.StringField()  # Breakfast, Lunch, Dinner, Snack
     saved_at = db.DateTimeField(default=datetime.datetime.utcnow)
 
+    meta = {
+        'indexes': [
+            ('user', '-saved_at', '-id'),  # newest-first keyset pages
+            ('user', 'name')  # duplicate check on save
+        ]
+    }
+
     def to_json(self):
         return {
             "id": str(self.id),
@@ -156,3 +207,98 @@ class SavedRecipe(db.Document):
             "mealType": self.meal_type,
             "savedAt": self.saved_at.isoformat()
         }
+
+class RecipeCacheEntry(db.Document):
+    """Shared cache of generated recipes keyed by request fingerprint"""
+    key = db.StringField(required=True, unique=True)
+    recipes = db.ListField(db.DictField(), default=[])
+    created_at = db.DateTimeField(default=datetime.datetime.utcnow)
+    expires_at = db.DateTimeField(required=True)
+
+    meta = {
+        'indexes': [
+            # Mongo's TTL monitor removes entries once expires_at has passed
+            {'fields': ['expires_at'], 'expireAfterSeconds': 0},
+            'created_at'
+        ]
+    }
+
+class NutritionCacheEntry(db.Document):
+    """Global cache of LLM nutrition lookups, keyed by normalized ingredient name"""
+    name_key = db.StringField(required=True, unique=True)
+    name = db.StringField()
+    calories = db.FloatField(default=0)  # per 100g
+    protein = db.FloatField(default=0)
+    carbs = db.FloatField(default=0)
+    fat = db.FloatField(default=0)
+    shelf_life_days = db.IntField()  # stored relative so the suggested expiry stays current
+    created_at = db.DateTimeField(default=datetime.datetime.utcnow)
+    expires_at = db.DateTimeField(required=True)
+
+    meta = {
+        'indexes': [
+            # Entries are re-fetched from the LLM after NUTRITION_CACHE_TTL
+            {'fields': ['expires_at'], 'expireAfterSeconds': 0}
+        ]
+    }
+
+class RecipeJob(db.Document):
+    """Background recipe generation job, pollable from any worker"""
+    user = db.ReferenceField(User, required=True)
+    request_key = db.StringField(required=True)  # recipe cache fingerprint, used to dedupe
+    meal_type = db.StringField()
+    status = db.StringField(default="queued")  # queued, running, done, failed
+    result = db.DictField()
+    error = db.DictField()
+    created_at = db.DateTimeField(default=datetime.datetime.utcnow)
+    heartbeat_at = db.DateTimeField()  # refreshed by the owning worker while queued or running
+    finished_at = db.DateTimeField()
+    expires_at = db.DateTimeField(required=True)
+
+    meta = {
+        'indexes': [
+            ('user', 'request_key'),
+            {'fields': ['expires_at'], 'expireAfterSeconds': 0}
+        ]
+    }
+
+    def to_json(self):
+        data = {
+            "jobId": str(self.id),
+            "status": self.status,
+            "mealType": self.meal_type,
+            "createdAt": self.created_at.isoformat()
+        }
+        if self.status == "done":
+            data["result"] = self.result
+        if self.status == "failed":
+            data["error"] = self.error
+        return data
+
+class UserDataVersion(db.Document):
+    """Per-user change counters (e.g. counters.fridge), bumped by every mutation route"""
+    user = db.ReferenceField(User, required=True, unique=True)
+    counters = db.DictField(default={})
+
+class PrecomputedRecipes(db.Document):
+    """Recipes generated ahead of time for a user's meal type, valid while the data versions match"""
+    user = db.ReferenceField(User, required=True)
+    meal_type = db.StringField(required=True)
+    requests = db.IntField(default=0)  # how often the user generates this meal type
+    count = db.IntField()
+    fridge_version = db.IntField()
+    preferences_version = db.IntField()
+    recipes = db.ListField(db.DictField(), default=[])
+    created_at = db.DateTimeField()
+
+    meta = {
+        'indexes': [
+            {'fields': ('user', 'meal_type'), 'unique': True}
+        ]
+    }
+
+class CatalogVersion(db.Document):
+    """Change counter for a shared catalog; workers poll it to refresh their in-memory snapshot"""
+    name = db.StringField(required=True, unique=True)  # e.g. "common_ingredients"
+    version = db.IntField(default=0)
+    updated_at = db.DateTimeField()
@@ -0,0 +1,70 @@
+# pagination.py
+# Keyset (cursor) pagination and sparse fieldsets for list endpoints.
+# A cursor is the sort key of the last row a client received, (value, _id),
+# encoded as an opaque URL-safe string; the next page starts strictly after it,
+# so pages stay stable while rows are added and cost the same at any depth.
+
+import base64
+import datetime
+
+import orjson
+from bson import ObjectId
+from bson.errors import InvalidId
+from mongoengine.queryset.visitor import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(value, doc_id):
+    """Opaque cursor for the row with sort value (a datetime) and doc_id"""
+    payload = orjson.dumps([value.isoformat(), str(doc_id)])
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+
+def decode_cursor(cursor):
+    """(datetime, ObjectId) from a cursor; ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, doc_id = orjson.loads(base64.urlsafe_b64decode(padded))
+        return datetime.datetime.fromisoformat(value), ObjectId(doc_id)
+    except (ValueError, TypeError, InvalidId, orjson.JSONDecodeError):
+        raise ValueError("Invalid cursor")
+
+def after_cursor(queryset, field, cursor, descending=False):
+    """queryset restricted to rows after cursor in (field, _id) order"""
+    if not cursor:
+        return queryset
+    value, doc_id = decode_cursor(cursor)
+    op = "lt" if descending else "gt"
+    return queryset.filter(Q(**{f"{field}__{op}": value}) | Q(**{field: value, f"id__{op}": doc_id}))
+
+def page_size(value):
+    """Requested page size clamped to [1, MAX_PAGE_SIZE]; ValueError if not an integer"""
+    if value in (None, ""):
+        return DEFAULT_PAGE_SIZE
+    return min(MAX_PAGE_SIZE, max(1, int(value)))
+
+def parse_fields(value, allowed):
+    """
+    API field names requested via ?fields=a,b (None means all fields).
+    ValueError names any field not in allowed.
+    """
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def paginate(queryset, field, cursor, limit, descending=False):
+    """
+    Up to limit raw rows after cursor, plus the cursor for the next page
+    (None on the last page). queryset must already be ordered by (field, _id).
+    """
+    docs = list(after_cursor(queryset, field, cursor, descending).limit(limit + 1))
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1][field], docs[-1]["_id"])
+    return docs, next_cursor
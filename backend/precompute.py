@@ -0,0 +1,151 @@
+# precompute.py
+# Speculative recipe precomputation.
+# Fridge edits are usually followed by a "generate" click, so when prefetching is
+# enabled a debounced background task generates recipes for the user's most-used
+# meal types right after the fridge changes. /api/recipes/generate serves those
+# directly while the user's fridge and preference versions still match.
+
+import os
+import time
+import datetime
+import logging
+import threading
+
+from models import Ingredient, UserPreference, PrecomputedRecipes
+from llm_client import in_flight, LLM_MAX_IN_FLIGHT
+from llm_service import DEFAULT_RECIPE_COUNT, is_fallback_result
+from cache import cached_generate_recipes
+from versions import get_versions, FRIDGE, PREFERENCES
+import metrics
+
+logger = logging.getLogger(__name__)
+
+RECIPE_PREFETCH = os.getenv("RECIPE_PREFETCH", "0") == "1"
+PREFETCH_DEBOUNCE = float(os.getenv("PREFETCH_DEBOUNCE", 5))  # seconds of fridge quiet before prefetching
+PREFETCH_MEAL_TYPES = int(os.getenv("PREFETCH_MEAL_TYPES", 2))  # most-used meal types per user
+PREFETCH_MAX_CONCURRENCY = int(os.getenv("PREFETCH_MAX_CONCURRENCY", 2))
+PREFETCH_MAX_PER_MINUTE = int(os.getenv("PREFETCH_MAX_PER_MINUTE", 20))
+# Skip prefetching while interactive calls hold this many LLM slots
+PREFETCH_BUSY_THRESHOLD = int(os.getenv("PREFETCH_BUSY_THRESHOLD", max(LLM_MAX_IN_FLIGHT // 2, 1)))
+
+
+def load_recipe_context(user):
+    """Fridge ingredients and preferences used to prompt recipe generation"""
+    # Get user's fridge ingredients
+    ingredients = Ingredient.objects(user=user)
+    ingredients_list = [ing.to_json() for ing in ingredients]
+
+    # Get user preferences
+    pref = UserPreference.objects(user=user).first()
+    if not pref:
+        pref = UserPreference(user=user)
+        pref.save()
+
+    return ingredients_list, pref.to_json()
+
+
+# -------------------------
+# Precomputed result store
+# -------------------------
+
+def find_precomputed(user, meal_type, count):
+    """
+    Count a generate request for meal_type and return precomputed recipes if they
+    are still valid for the user's current fridge and preferences, else None.
+    """
+    if not RECIPE_PREFETCH:
+        return None
+
+    doc = PrecomputedRecipes._get_collection().find_one_and_update(
+        {"user": user.pk, "meal_type": meal_type},
+        {"$inc": {"requests": 1}},
+        upsert=True
+    )
+    if not doc or not doc.get("recipes") or doc.get("count") != count:
+        return None
+
+    versions = get_versions(user)
+    if (doc.get("fridge_version") != versions.get(FRIDGE, 0)
+            or doc.get("preferences_version") != versions.get(PREFERENCES, 0)):
+        return None
+    return doc["recipes"]
+
+def _store_precomputed(user, meal_type, count, versions, recipes):
+    PrecomputedRecipes.objects(user=user, meal_type=meal_type).update_one(
+        set__count=count,
+        set__fridge_version=versions.get(FRIDGE, 0),
+        set__preferences_version=versions.get(PREFERENCES, 0),
+        set__recipes=recipes,
+        set__created_at=datetime.datetime.utcnow(),
+        upsert=True
+    )
+
+
+# -------------------------
+# Prefetcher
+# -------------------------
+
+_timers = {}
+_timers_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PREFETCH_MAX_CONCURRENCY)
+_quota_lock = threading.Lock()
+_quota_window = [0.0, 0]  # [window start, generations in window]
+
+def schedule_prefetch(user):
+    """Called after a fridge mutation; (re)starts the user's debounce timer"""
+    if not RECIPE_PREFETCH:
+        return
+    user_id = str(user.pk)
+    timer = threading.Timer(PREFETCH_DEBOUNCE, _prefetch_user, args=(user,))
+    timer.daemon = True
+    with _timers_lock:
+        previous = _timers.pop(user_id, None)
+        if previous:
+            previous.cancel()
+        _timers[user_id] = timer
+    timer.start()
+
+def _take_quota():
+    """Global per-process cap on prefetch generations per minute"""
+    now = time.monotonic()
+    with _quota_lock:
+        if now - _quota_window[0] >= 60:
+            _quota_window[0], _quota_window[1] = now, 0
+        if _quota_window[1] >= PREFETCH_MAX_PER_MINUTE:
+            return False
+        _quota_window[1] += 1
+        return True
+
+def _interactive_busy():
+    return in_flight() >= PREFETCH_BUSY_THRESHOLD
+
+def _prefetch_user(user):
+    metrics.set_endpoint("recipe_prefetch")
+    with _timers_lock:
+        _timers.pop(str(user.pk), None)
+
+    # Prefetching is best effort: drop it rather than queue behind other work
+    if not _slots.acquire(blocking=False):
+        return
+    try:
+        meal_types = [
+            doc.meal_type for doc in
+            PrecomputedRecipes.objects(user=user).only('meal_type').order_by('-requests').limit(PREFETCH_MEAL_TYPES)
+        ] or ["Dinner"]
+
+        versions = get_versions(user)
+        ingredients_list, preferences = load_recipe_context(user)
+        if not ingredients_list:
+            return
+
+        for meal_type in meal_types:
+            if _interactive_busy() or not _take_quota():
+                return
+            recipes, _ = cached_generate_recipes(ingredients_list, preferences, meal_type, DEFAULT_RECIPE_COUNT)
+            # Never precompute the canned fallback from a failed LLM call
+            if recipes and not is_fallback_result(recipes):
+                _store_precomputed(user, meal_type, DEFAULT_RECIPE_COUNT, versions, recipes)
+    except Exception as e:
+        logger.warning(f"Recipe prefetch failed: {e}")
+    finally:
+        _slots.release()
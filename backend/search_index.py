@@ -0,0 +1,156 @@
+# search_index.py
+# In-memory autocomplete index over ingredient names.
+# Prefix matches come from a sorted list of name suffixes starting at each word
+# (binary search, so "breast" finds "Chicken Breast"); typo-tolerant matches come
+# from a word-trigram inverted index. Results are ranked by match quality, then
+# popularity and the caller's personal usage.
+
+import re
+import math
+import heapq
+from bisect import bisect_left
+from array import array
+from collections import Counter
+
+from cache import normalize_ingredient_name
+
+# Queries this short are answered from precomputed top lists instead of a scan
+SHORT_PREFIX_LENGTH = 2
+SHORT_PREFIX_TOP = 50
+# Prefix entries examined per longer query
+PREFIX_SCAN_LIMIT = 2000
+# Fuzzy matching needs this many characters and this share of the query's trigrams
+FUZZY_MIN_LENGTH = 4
+FUZZY_MIN_OVERLAP = 0.5
+
+SCORE_EXACT = 100
+SCORE_PREFIX = 80
+SCORE_WORD_PREFIX = 60
+SCORE_FUZZY = 40
+POPULARITY_WEIGHT = 4
+USAGE_WEIGHT = 15
+
+
+def _word_starts(key):
+    return [m.start() for m in re.finditer(r"[^\s(),/-]+", key)]
+
+def _trigrams(key):
+    grams = set()
+    for word in re.findall(r"[^\s(),/-]+", key):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SearchIndex:
+    """
+    Immutable index over (name, item, popularity) entries.
+    search() returns the items best matching a partial, possibly misspelled query.
+    """
+
+    def __init__(self, entries):
+        self.keys = []
+        self.items = []
+        self.popularity = []
+        suffixes = []
+        postings = {}
+        for position, (name, item, popularity) in enumerate(entries):
+            key = normalize_ingredient_name(name)
+            self.keys.append(key)
+            self.items.append(item)
+            self.popularity.append(popularity or 0)
+            for start in _word_starts(key):
+                suffixes.append((key[start:], position, start == 0))
+            for gram in _trigrams(key):
+                postings.setdefault(gram, array("i")).append(position)
+
+        suffixes.sort()
+        self._suffixes = [suffix for suffix, _, _ in suffixes]
+        self._suffix_ids = array("i", (position for _, position, _ in suffixes))
+        self._suffix_full = [full for _, _, full in suffixes]
+        self._postings = postings
+        self._short = self._build_short_prefixes()
+
+    def _build_short_prefixes(self):
+        """{prefix: [(position, score), ...]} for the best matches of every 1-2 letter prefix"""
+        candidates = {}
+        for suffix, position, full in zip(self._suffixes, self._suffix_ids, self._suffix_full):
+            score = self._prefix_score(position, suffix, full)
+            for length in range(1, min(SHORT_PREFIX_LENGTH, len(suffix)) + 1):
+                candidates.setdefault(suffix[:length], []).append(
+                    (score + POPULARITY_WEIGHT * math.log1p(self.popularity[position]), position, score)
+                )
+        short = {}
+        for prefix, entries in candidates.items():
+            best = {}
+            for _, position, score in heapq.nlargest(SHORT_PREFIX_TOP * 2, entries):
+                if score > best.get(position, 0):
+                    best[position] = score
+            short[prefix] = list(best.items())[:SHORT_PREFIX_TOP]
+        return short
+
+    def _prefix_score(self, position, query, full):
+        if self.keys[position] == query:
+            return SCORE_EXACT
+        return SCORE_PREFIX if full else SCORE_WORD_PREFIX
+
+    def __len__(self):
+        return len(self.items)
+
+    def _prefix_matches(self, query):
+        """{position: score} for names with a word starting with query"""
+        if len(query) <= SHORT_PREFIX_LENGTH:
+            return {
+                position: SCORE_EXACT if self.keys[position] == query else score
+                for position, score in self._short.get(query, [])
+            }
+        matches = {}
+        i = bisect_left(self._suffixes, query)
+        end = min(len(self._suffixes), i + PREFIX_SCAN_LIMIT)
+        while i < end and self._suffixes[i].startswith(query):
+            position = self._suffix_ids[i]
+            score = self._prefix_score(position, query, self._suffix_full[i])
+            if score > matches.get(position, 0):
+                matches[position] = score
+            i += 1
+        return matches
+
+    def _fuzzy_matches(self, query, exclude):
+        """{position: score} for names sharing most of the query's trigrams"""
+        grams = _trigrams(query)
+        if len(query) < FUZZY_MIN_LENGTH or not grams:
+            return {}
+        counts = Counter()
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is not None:
+                counts.update(posting)
+        needed = max(2, math.ceil(len(grams) * FUZZY_MIN_OVERLAP))
+        return {
+            position: SCORE_FUZZY * shared / len(grams)
+            for position, shared in counts.items()
+            if shared >= needed and position not in exclude
+        }
+
+    def search(self, query, limit=10, usage=None):
+        """
+        Up to limit (score, item) pairs, best first. usage maps normalized names
+        to how often the caller uses them and boosts those names.
+        """
+        query = normalize_ingredient_name(query)
+        if not query:
+            return []
+        matches = self._prefix_matches(query)
+        if len(matches) < limit:
+            matches.update(self._fuzzy_matches(query, matches))
+
+        usage = usage or {}
+        scored = []
+        for position, score in matches.items():
+            key = self.keys[position]
+            score += POPULARITY_WEIGHT * math.log1p(self.popularity[position])
+            score += USAGE_WEIGHT * math.log1p(usage.get(key, 0))
+            score -= 0.1 * len(key)  # shorter names first among equals
+            scored.append((score, key, position))
+        scored.sort(key=lambda entry: (-entry[0], entry[1]))
+        return [(score, self.items[position]) for score, _, position in scored[:limit]]
@@ -0,0 +1,99 @@
+# serializers.py
+# Fast read path for list endpoints. Queries project only the fields the API
+# returns and come back as raw pymongo dicts (as_pymongo()), which are mapped
+# straight to the same shape as the models' to_json() and encoded with orjson.
+# Skips building a MongoEngine Document per row; see bench_serialization.py.
+# List endpoints that take ?fields= project only the requested API fields.
+
+import orjson
+from flask import Response
+
+INGREDIENT_FIELDS = (
+    'id', 'name', 'quantity', 'unit', 'expiry_date', 'calories', 'protein', 'carbs', 'fat'
+)
+# API field name -> model field, for ?fields= projections
+SAVED_RECIPE_API_FIELDS = {
+    "name": "name",
+    "description": "description",
+    "available_ingredients": "available_ingredients",
+    "missing_ingredients": "missing_ingredients",
+    "instructions": "instructions",
+    "nutrition": "nutrition",
+    "cookingTime": "cooking_time",
+    "difficulty": "difficulty",
+    "tags": "tags",
+    "mealType": "meal_type",
+    "savedAt": "saved_at"
+}
+CALORIE_LOG_API_FIELDS = {
+    "date": "date",
+    "calories": "calories",
+    "mealType": "meal_type",
+    "note": "note",
+    "createdAt": "created_at"
+}
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+def ingredient_row(doc):
+    """Raw Ingredient document -> Ingredient.to_json() shape"""
+    return {
+        "id": str(doc["_id"]),
+        "name": doc.get("name"),
+        "quantity": doc.get("quantity"),
+        "unit": doc.get("unit"),
+        "expiryDate": doc.get("expiry_date"),
+        "calories": doc.get("calories", 0),
+        "protein": doc.get("protein", 0),
+        "carbs": doc.get("carbs", 0),
+        "fat": doc.get("fat", 0)
+    }
+
+def saved_recipe_row(doc):
+    """Raw SavedRecipe document -> SavedRecipe.to_json() shape"""
+    return {
+        "id": str(doc["_id"]),
+        "name": doc.get("name"),
+        "description": doc.get("description"),
+        "available_ingredients": doc.get("available_ingredients", []),
+        "missing_ingredients": doc.get("missing_ingredients", []),
+        "instructions": doc.get("instructions", []),
+        "nutrition": doc.get("nutrition", {}),
+        "cookingTime": doc.get("cooking_time"),
+        "difficulty": doc.get("difficulty"),
+        "tags": doc.get("tags", []),
+        "mealType": doc.get("meal_type"),
+        "savedAt": _isoformat(doc.get("saved_at"))
+    }
+
+def calorie_log_row(doc):
+    """Raw DailyCalorieLog document -> DailyCalorieLog.to_json() shape"""
+    return {
+        "id": str(doc["_id"]),
+        "date": doc["date"].date().isoformat() if "date" in doc else None,  # stored as midnight datetimes
+        "calories": doc.get("calories"),
+        "mealType": doc.get("meal_type"),
+        "note": doc.get("note"),
+        "createdAt": _isoformat(doc.get("created_at"))
+    }
+
+def rows(queryset, fields, row):
+    """Map a queryset to API dicts through the raw path, fetching only fields"""
+    return [row(doc) for doc in queryset.only(*fields).as_pymongo()]
+
+def projection(api_fields, field_map, *required):
+    """Model fields to fetch for the requested API fields (None: all), plus id and required"""
+    names = field_map if api_fields is None else api_fields
+    return tuple(dict.fromkeys(('id',) + tuple(field_map[name] for name in names) + required))
+
+def select(data, api_fields):
+    """data limited to id and the requested API fields (None: everything)"""
+    if api_fields is None:
+        return data
+    return {key: data[key] for key in ("id", *api_fields)}
+
+def json_response(data, status=200):
+    """jsonify() equivalent encoded with orjson"""
+    return Response(orjson.dumps(data), status=status, mimetype="application/json")
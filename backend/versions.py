@@ -0,0 +1,22 @@
+# versions.py
+# Per-user data version counters. Mutation routes bump the counter for what
+# they changed, so anything derived from that data can tell when it is stale.
+
+from models import UserDataVersion
+
+FRIDGE = "fridge"
+PREFERENCES = "preferences"
+CALORIES = "calories"
+SAVED_RECIPES = "saved_recipes"
+
+def bump_version(user, *names):
+    """Increment the named counters for user (one upsert)"""
+    UserDataVersion.objects(user=user).update_one(
+        upsert=True,
+        **{f"inc__counters__{name}": 1 for name in names}
+    )
+
+def get_versions(user):
+    """All counters for user; missing counters read as 0"""
+    doc = UserDataVersion.objects(user=user).only('counters').first()
+    return doc.counters if doc else {}
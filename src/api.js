@@ -92,6 +92,21 @@ export async function addIngredient(ingredient) {
   return res.json();
 }
 
+// Add several ingredients in one request; resolves to { created, failed, results }
+export async function addIngredientsBulk(ingredients) {
+  const res = await fetch(`${API_BASE}/ingredients/bulk`, {
+    method: "POST",
+    headers: getAuthHeaders(),
+    body: JSON.stringify({ ingredients }),
+  });
+  await checkResponse(res);
+  const data = await res.json();
+  if (!res.ok && !data.results) {
+    throw new Error(data.error || "Failed to add ingredients");
+  }
+  return data;
+}
+
 export async function updateIngredient(id, ingredient) {
   const res = await fetch(`${API_BASE}/ingredients/${id}`, {
     method: "PUT",
@@ -176,6 +191,42 @@ export async function generateRecipes(mealType = "Dinner") {
   return res.json();
 }
 
+// Streams recipes over SSE; onRecipe is called for each recipe as it arrives.
+// Resolves with the final { count, cached } summary.
+export async function streamRecipes(mealType = "Dinner", onRecipe = () => {}) {
+  const res = await fetch(`${API_BASE}/recipes/generate/stream`, {
+    method: "POST",
+    headers: getAuthHeaders(),
+    body: JSON.stringify({ mealType }),
+  });
+  await checkResponse(res);
+  if (!res.ok) {
+    const err = await res.json();
+    throw new Error(err.error || err.message || "Failed to generate recipes");
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const message = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const event = (message.match(/^event: (.*)$/m) || [])[1];
+      const data = JSON.parse((message.match(/^data: (.*)$/m) || [])[1] || "{}");
+      if (event === "recipe") onRecipe(data);
+      else if (event === "error") throw new Error(data.error || "Failed to generate recipes");
+      else if (event === "done") return data;
+    }
+  }
+  throw new Error("Recipe stream ended unexpectedly");
+}
+
 // -----------------------------
 // Voice Input / LLM Parsing API
 // -----------------------------
@@ -216,16 +267,51 @@ export async function getNutritionInfo(ingredientName, quantity, unit) {
   return res.json();
 }
 
+// items: [{ name, quantity, unit }] -> { results: [...] } in the same order
+export async function getNutritionInfoBatch(items) {
+  const res = await fetch(`${API_BASE}/ingredients/nutrition/batch`, {
+    method: "POST",
+    headers: getAuthHeaders(),
+    body: JSON.stringify({ items }),
+  });
+  await checkResponse(res);
+  if (!res.ok) {
+    const err = await res.json();
+    throw new Error(err.error || "Failed to get nutrition information");
+  }
+  return res.json();
+}
+
 // -----------------------------
 // Saved Recipes API
 // -----------------------------
 
+// List view fields; the full recipe is loaded with getSavedRecipe when opened
+const SAVED_RECIPE_LIST_FIELDS = "name,description,nutrition,mealType,tags";
+
 export async function getSavedRecipes() {
-  const res = await fetch(`${API_BASE}/saved-recipes`, {
+  const recipes = [];
+  let cursor = null;
+  do {
+    const params = new URLSearchParams({ fields: SAVED_RECIPE_LIST_FIELDS });
+    if (cursor) params.set("cursor", cursor);
+    const res = await fetch(`${API_BASE}/saved-recipes?${params}`, {
+      headers: getAuthHeaders(),
+    });
+    await checkResponse(res);
+    if (!res.ok) throw new Error("Failed to fetch saved recipes");
+    recipes.push(...(await res.json()));
+    cursor = res.headers.get("X-Next-Cursor");
+  } while (cursor);
+  return recipes;
+}
+
+export async function getSavedRecipe(id) {
+  const res = await fetch(`${API_BASE}/saved-recipes/${id}`, {
     headers: getAuthHeaders(),
   });
   await checkResponse(res);
-  if (!res.ok) throw new Error("Failed to fetch saved recipes");
+  if (!res.ok) throw new Error("Failed to fetch saved recipe");
   return res.json();
 }
 
@@ -1,6 +1,6 @@
 import { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
-import { getSavedRecipes, deleteSavedRecipe } from "../api";
+import { getSavedRecipes, getSavedRecipe, deleteSavedRecipe } from "../api";
 import "../App.css";
 
 export default function SavedRecipesPage() {
@@ -25,6 +25,17 @@ export default function SavedRecipesPage() {
     }
   };
 
+  const openRecipe = async (recipe) => {
+    // The list only carries summary fields; show them while the rest loads
+    setSelectedRecipe(recipe);
+    try {
+      const full = await getSavedRecipe(recipe.id);
+      setSelectedRecipe(current => (current?.id === recipe.id ? full : current));
+    } catch (err) {
+      console.error("Failed to load recipe:", err);
+    }
+  };
+
   const handleDelete = async (id) => {
     if (window.confirm("Remove this recipe from your saved collection?")) {
       try {
@@ -66,7 +77,7 @@ export default function SavedRecipesPage() {
         <>
           <div className="recipes-grid">
             {recipes.map((recipe) => (
-              <div key={recipe.id} className="recipe-card-modern" onClick={() => setSelectedRecipe(recipe)}>
+              <div key={recipe.id} className="recipe-card-modern" onClick={() => openRecipe(recipe)}>
                 <div className="card-header">
                   <h4>{recipe.name}</h4>
                   {recipe.nutrition?.calories && (